@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import BenchmarkRunner, compare_results, load_results, save_results
+from benchmarks.suites import SUITES
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = 'Runs the benchmarks of the classifier and of the HTTP endpoints, and compares them with a baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', help=f"Suites to run (all of them by default): {', '.join(SUITES)}.")
+        parser.add_argument('--output', '-o', help='JSON file where the results are saved.')
+        parser.add_argument('--compare', metavar='BASELINE', help='JSON file with previous results. The command fails if any benchmark regressed.')
+        parser.add_argument('--threshold', type=float, default=0.1, help='Relative change considered a regression (0.1 by default).')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of measurements of each benchmark (5 by default).')
+        parser.add_argument('--quick', action='store_true', help='Use smaller sizes, to check that the benchmarks work.')
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options['suites'] if name not in SUITES]
+        if unknown:
+            raise CommandError(f"Unknown benchmark suites: {', '.join(unknown)}")
+
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = load_results(options['compare'])
+            except (OSError, ValueError) as error:
+                raise CommandError(error)
+
+        runner = BenchmarkRunner(repeat=options['repeat'], quick=options['quick'])
+        for name in options['suites'] or SUITES:
+            self.stdout.write(f'### {name} ###')
+            SUITES[name](runner)
+
+        report = runner.report()
+        if options['output']:
+            save_results(report, options['output'])
+
+        if baseline is None:
+            return
+
+        if baseline.get('quick') != report['quick'] or baseline.get('environment') != report['environment']:
+            self.stdout.write(self.style.WARNING('The baseline was measured with other sizes or in another environment'))
+
+        comparisons = compare_results(baseline, report, options['threshold'])
+        for comparison in comparisons:
+            line = f"{comparison['name']:<50} {comparison['change']:+8.1%}  {comparison['status']}"
+            if comparison['status'] == 'regression':
+                line = self.style.ERROR(line)
+            elif comparison['status'] == 'improvement':
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
+
+        regressions = [comparison['name'] for comparison in comparisons if comparison['status'] == 'regression']
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmarks regressed more than {options['threshold']:.0%}: {', '.join(regressions)}")
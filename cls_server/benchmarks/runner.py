@@ -0,0 +1,298 @@
+
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+
+
+# Version of the format of the results files
+RESULTS_VERSION = 1
+
+# Packages whose versions are recorded with the results
+PACKAGES = ('django', 'numpy', 'scikit-learn', 'scipy', 'joblib', 'orjson', 'requests')
+
+
+class BenchmarkRunner:
+    """Runs the benchmarks and collects their results.
+
+    Each result is identified by a name and has a `metric`, its main `value` and the statistics of the measurement. The metrics
+    are 'seconds' (the time of a call, lower is better) or 'requests_per_second' (higher is better).
+
+    """
+
+    def __init__(self, repeat: int = 5, warmup: int = 1, quick: bool = False, verbose: bool = True):
+        """
+        Args:
+            repeat (int, optional):
+                Number of measurements of each benchmark. Defaults to 5.
+            warmup (int, optional):
+                Number of calls before the measurements (to load the models, fill the caches, ...). Defaults to 1.
+            quick (bool, optional):
+                If True, the suites use smaller sizes (to check that they work, the results are not comparable). Defaults to False.
+            verbose (bool, optional):
+                Whether each result is printed when it is recorded. Defaults to True.
+
+        """
+        self.repeat = repeat
+        self.warmup = warmup
+        self.quick = quick
+        self.verbose = verbose
+        self.results = dict()
+
+    def time(self, name: str, func: callable, number: int = 1, repeat: int = None, warmup: int = None) -> dict:
+        """Measures the time of a function and records it.
+
+        Args:
+            name (str):
+                Name of the benchmark.
+            func (callable):
+                Function without arguments.
+            number (int, optional):
+                Number of calls of each measurement. The time of a call is the time of the measurement divided by `number`. Defaults to 1.
+            repeat (int, optional):
+                Number of measurements. Defaults to `self.repeat`.
+            warmup (int, optional):
+                Number of calls before the measurements. Defaults to `self.warmup`.
+
+        Returns:
+            dict:
+                The result (see `timing_result`).
+
+        """
+        repeat = self.repeat if repeat is None else repeat
+        warmup = self.warmup if warmup is None else warmup
+
+        for _ in range(warmup):
+            func()
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number)
+
+        return self.record(name, timing_result(times, number))
+
+    def record(self, name: str, result: dict) -> dict:
+        """Records the result of a benchmark.
+
+        Args:
+            name (str):
+                Name of the benchmark.
+            result (dict):
+                The result, with at least the keys 'metric' and 'value'.
+
+        Raises:
+            ValueError:
+                If there is already a result with the same name.
+
+        Returns:
+            dict:
+                The result.
+
+        """
+        if name in self.results:
+            raise ValueError(f'Duplicated benchmark: {name}')
+
+        self.results[name] = result
+        if self.verbose:
+            print(f'{name:<50} {format_value(result)}')
+        return result
+
+    def report(self) -> dict:
+        """Builds the content of a results file.
+
+        Returns:
+            dict:
+                The version of the format, the date, the environment and the results.
+
+        """
+        return {
+            'version': RESULTS_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'quick': self.quick,
+            'environment': environment(),
+            'results': self.results,
+        }
+
+
+def timing_result(times: list[float], number: int = 1) -> dict:
+    """Summarizes the measured times of a benchmark.
+
+    Args:
+        times (list[float]):
+            Seconds of each call (or mean of the calls of each measurement).
+        number (int, optional):
+            Number of calls of each measurement. Defaults to 1.
+
+    Returns:
+        dict:
+            The metric ('seconds') and the median time as value, with the minimum, mean, standard deviation and number of measurements.
+
+    """
+    return {
+        'metric': 'seconds',
+        'value': statistics.median(times),
+        'min': min(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'repeat': len(times),
+        'number': number,
+    }
+
+
+def latency_result(latencies: list[float], wall_time: float, concurrency: int) -> dict:
+    """Summarizes the requests of a load test.
+
+    Args:
+        latencies (list[float]):
+            Seconds of each request.
+        wall_time (float):
+            Seconds from the first request to the end of the last one.
+        concurrency (int):
+            Number of clients that sent the requests at the same time.
+
+    Returns:
+        dict:
+            The metric ('requests_per_second') and the throughput as value, with the percentiles 50, 90 and 99 of the latency (seconds).
+
+    """
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]).tolist()
+    return {
+        'metric': 'requests_per_second',
+        'value': len(latencies) / wall_time,
+        'p50': p50,
+        'p90': p90,
+        'p99': p99,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+    }
+
+
+def format_value(result: dict) -> str:
+    """Formats the main value of a result for the console."""
+    if result['metric'] == 'seconds':
+        value = result['value']
+        if value < 1e-3:
+            return f'{value * 1e6:10.1f} us'
+        if value < 1:
+            return f'{value * 1e3:10.2f} ms'
+        return f'{value:10.3f} s'
+
+    return f"{result['value']:10.1f} req/s (p50 {result['p50'] * 1e3:.2f} ms, p99 {result['p99'] * 1e3:.2f} ms)"
+
+
+def environment() -> dict:
+    """Describes the machine and the software of the benchmarks, to know if two results files are comparable."""
+    packages = dict()
+    for package in PACKAGES:
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+
+    return {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'packages': packages,
+    }
+
+
+def save_results(report: dict, file_path: str) -> None:
+    """Writes a results file (see `BenchmarkRunner.report`).
+
+    Args:
+        report (dict):
+            The content of the file.
+        file_path (str):
+            The path of the JSON file.
+
+    """
+    with open(file_path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(file_path: str) -> dict:
+    """Reads a results file.
+
+    Args:
+        file_path (str):
+            The path of the JSON file.
+
+    Raises:
+        ValueError:
+            If the file is not a results file of a supported version.
+
+    Returns:
+        dict:
+            The content of the file.
+
+    """
+    with open(file_path) as f:
+        report = json.load(f)
+
+    if not isinstance(report, dict) or report.get('version') != RESULTS_VERSION or not isinstance(report.get('results'), dict):
+        raise ValueError(f'Unsupported benchmark results file: {file_path}')
+
+    return report
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.1) -> list[dict]:
+    """Compares the results of the benchmarks that are in two results files.
+
+    A benchmark is a regression if its time increased (or its throughput decreased) more than `threshold` relative to the baseline,
+    and an improvement if it changed as much in the other direction.
+
+    Args:
+        baseline (dict):
+            The reference results (see `BenchmarkRunner.report`).
+        current (dict):
+            The new results.
+        threshold (float, optional):
+            Relative change that is considered significant. Defaults to 0.1 (10%).
+
+    Returns:
+        list[dict]:
+            For each benchmark of both files, its name, metric, baseline and current values, relative change
+            (positive is worse) and status ('regression', 'improvement' or 'unchanged').
+
+    """
+    comparisons = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None or reference['metric'] != result['metric'] or reference['value'] <= 0:
+            continue
+
+        change = result['value'] / reference['value'] - 1
+        if result['metric'] == 'requests_per_second':
+            change = reference['value'] / result['value'] - 1 if result['value'] > 0 else float('inf')
+
+        if change > threshold:
+            status = 'regression'
+        elif change < -threshold:
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+
+        comparisons.append({
+            'name': name,
+            'metric': result['metric'],
+            'baseline': reference['value'],
+            'current': result['value'],
+            'change': change,
+            'status': status,
+        })
+
+    return comparisons
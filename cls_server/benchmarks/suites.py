@@ -0,0 +1,176 @@
+
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import numpy as np
+from django.conf import settings
+
+from logic.classifier import MyClassifier
+from logic.dataset.numbers import load
+
+from .runner import BenchmarkRunner, latency_result
+
+
+# Seed of the random values of the benchmarks, so every run classifies the same values
+SEED = 0
+
+
+def benchmark_load(runner: BenchmarkRunner) -> None:
+    """Loads datasets of growing sizes with `numbers.load`."""
+    sizes = (1000, 10000) if runner.quick else (1000, 10000, 100000, 1000000)
+
+    for size in sizes:
+        runner.time(f'load[{size}]', lambda: load((0, size, 1), (0, 100, 1)))
+
+
+def benchmark_build(runner: BenchmarkRunner) -> None:
+    """Builds the models end to end (evaluation of the candidates and training of the best ones), with the server configuration."""
+    dataset = load(settings.CLS_TRAIN_PARAMETERS, settings.CLS_TEST_PARAMETERS, settings.CLS_PREPROCESSOR)
+
+    runner.time('build_models', lambda: _new_classifier().build_models(dataset), repeat=1 if runner.quick else 3, warmup=0)
+
+
+def benchmark_predict(runner: BenchmarkRunner) -> None:
+    """Predicts single values and batches with each model and with the ensemble of all of them."""
+    classifier = _trained_classifier()
+    rng = np.random.default_rng(SEED)
+
+    values = itertools.cycle(rng.integers(0, 1_000_000, 1000).tolist())
+    batch = rng.integers(0, 1_000_000, 10000 if runner.quick else 100000)
+    number = 20 if runner.quick else 100
+
+    for model_name in classifier.models_name() + [None]:
+        label = model_name or 'ensemble'
+
+        runner.time(f'predict[{label}]', lambda: classifier.predict(next(values), model_name=model_name), number=number)
+        runner.time(f'predict_batch[{label},{len(batch)}]', lambda: classifier.predict_batch(batch, model_name=model_name))
+
+
+def benchmark_http(runner: BenchmarkRunner) -> None:
+    """Sends concurrent requests to the list and predict endpoints of a server that runs in this process."""
+    import requests
+
+    n_requests = 50 if runner.quick else 1000
+    concurrency = 4
+    rng = np.random.default_rng(SEED)
+
+    server = _start_server()
+    try:
+        url = f'http://127.0.0.1:{server.server_port}/api/number-classifier/'
+
+        # The first request imports the views, which build the models
+        requests.get(url + 'list_models/').raise_for_status()
+
+        endpoints = [
+            ('list_models', 'get', None),
+            ('predict[1]', 'post', {'values': rng.integers(0, 1_000_000, 1).tolist()}),
+            ('predict[100]', 'post', {'values': rng.integers(0, 1_000_000, 100).tolist()}),
+            ('predict[10000]', 'post', {'values': rng.integers(0, 1_000_000, 10000).tolist()}),
+        ]
+        for name, method, body in endpoints:
+            endpoint = url + ('list_models/' if method == 'get' else 'predict/')
+            latencies, wall_time = _load_test(method, endpoint, body, n_requests, concurrency)
+            runner.record(f'http.{name}', latency_result(latencies, wall_time, concurrency))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# Benchmarks of each suite, in order of execution
+SUITES = {
+    'load': benchmark_load,
+    'build': benchmark_build,
+    'predict': benchmark_predict,
+    'http': benchmark_http,
+}
+
+
+def _new_classifier() -> MyClassifier:
+    return MyClassifier(
+        n_jobs=settings.CLS_TRAINING_JOBS,
+        backend=settings.CLS_TRAINING_BACKEND,
+        dedupe=settings.CLS_TRAINING_DEDUPE,
+        selection=settings.CLS_MODEL_SELECTION,
+        halving_factor=settings.CLS_HALVING_FACTOR,
+        halving_min_folds=settings.CLS_HALVING_MIN_FOLDS,
+        halving_tolerance=settings.CLS_HALVING_TOLERANCE,
+        preprocessor=settings.CLS_PREPROCESSOR
+    )
+
+
+@cache
+def _trained_classifier() -> MyClassifier:
+    classifier = _new_classifier()
+    classifier.build_models(load(settings.CLS_TRAIN_PARAMETERS, settings.CLS_TEST_PARAMETERS, classifier.preprocessor))
+    return classifier
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server() -> WSGIServer:
+    """Starts the WSGI application of the project in a thread, on a free port."""
+    from django.core.wsgi import get_wsgi_application
+
+    server = make_server('127.0.0.1', 0, get_wsgi_application(), server_class=_ThreadingWSGIServer, handler_class=_QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _load_test(method: str, url: str, body: dict, n_requests: int, concurrency: int) -> tuple[list[float], float]:
+    """Sends requests from several clients at the same time.
+
+    Args:
+        method (str):
+            'get' or 'post' (with `body` as JSON).
+        url (str):
+            The URL of the endpoint.
+        body (dict):
+            The content of the POST requests.
+        n_requests (int):
+            Total number of requests.
+        concurrency (int):
+            Number of clients.
+
+    Returns:
+        tuple[list[float], float]:
+            The seconds of each request, and the seconds from the first request to the end of the last one.
+
+    """
+    import requests
+
+    def client(n: int) -> list[float]:
+        latencies = []
+        with requests.Session() as session:
+            # One request to open the connection before the measurements
+            session.request(method, url, json=body).raise_for_status()
+            barrier.wait()
+            for _ in range(n):
+                start = time.perf_counter()
+                session.request(method, url, json=body).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    barrier = threading.Barrier(concurrency + 1, timeout=60)
+    counts = [len(chunk) for chunk in np.array_split(np.arange(n_requests), concurrency)]
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = [executor.submit(client, n) for n in counts]
+        barrier.wait()
+        start = time.perf_counter()
+        latencies = [latency for future in futures for latency in future.result()]
+        wall_time = time.perf_counter() - start
+
+    return latencies, wall_time
@@ -0,0 +1,126 @@
+"""
+Coalescing of prediction requests (micro-batching).
+
+Concurrent requests are queued for a short window and predicted as a single batch, so the models are called once for all of them.
+"""
+
+import asyncio
+import weakref
+
+import numpy as np
+
+
+class PredictionBatcher:
+    """Groups the values of the predictions requested in a window of time and predicts them as a single batch.
+
+    The requests are grouped by model name. A group is predicted when its window expires or when it reaches `max_values` values,
+    and each caller receives the slice of the result that corresponds to its values.
+
+    """
+
+    def __init__(self, predict_batch: callable, window: float = 0.002, max_values: int = 10000):
+        """
+        Args:
+            predict_batch (callable):
+                Function `(values, model_name) -> np.ndarray` that predicts a batch of values (int64 array). It is run in a separate thread.
+            window (float, optional):
+                Seconds that a request waits for other requests before the batch is predicted. Defaults to 0.002.
+            max_values (int, optional):
+                Number of values that triggers the prediction of a batch before the window expires. Defaults to 10000.
+
+        """
+        self.predict_batch = predict_batch
+        self.window = window
+        self.max_values = max_values
+        # Each event loop has its own queues (under WSGI, every async request runs in its own loop)
+        self._states = weakref.WeakKeyDictionary()
+
+    async def predict(self, values: np.ndarray[np.int64], model_name: str = None) -> np.ndarray:
+        """Predicts a list of values, together with the values of other requests.
+
+        Args:
+            values (np.ndarray[np.int64]):
+                The input values for prediction.
+            model_name (str, optional):
+                The name of the specific model to use for prediction. If None, the ensemble of all models is used.
+
+        Returns:
+            np.ndarray:
+                The predicted output values, in the same order as `values`.
+
+        """
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _BatchState()
+
+        future = loop.create_future()
+        state.pending.setdefault(model_name, []).append((values, future))
+        state.sizes[model_name] = state.sizes.get(model_name, 0) + len(values)
+
+        if state.sizes[model_name] >= self.max_values:
+            self._flush(loop, state, model_name)
+        elif model_name not in state.timers:
+            state.timers[model_name] = loop.call_later(self.window, self._flush, loop, state, model_name)
+
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, state: '_BatchState', model_name: str) -> None:
+        """Starts the prediction of the queued requests of a model.
+
+        Args:
+            loop (asyncio.AbstractEventLoop):
+                The event loop of the requests.
+            state (_BatchState):
+                The queues of the loop.
+            model_name (str):
+                The model name of the requests.
+
+        """
+        timer = state.timers.pop(model_name, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = state.pending.pop(model_name, [])
+        state.sizes.pop(model_name, None)
+
+        if batch:
+            task = loop.create_task(self._run(batch, model_name))
+            state.tasks.add(task)
+            task.add_done_callback(state.tasks.discard)
+
+    async def _run(self, batch: list[tuple[np.ndarray[np.int64], asyncio.Future]], model_name: str) -> None:
+        """Predicts a batch and delivers to each request its slice of the result.
+
+        Args:
+            batch (list[tuple[np.ndarray[np.int64], asyncio.Future]]):
+                The values of each request and the future that receives its result.
+            model_name (str):
+                The model name of the requests.
+
+        """
+        values = np.concatenate([np.asarray(request_values, dtype=np.int64) for request_values, _ in batch])
+
+        try:
+            labels = await asyncio.to_thread(self.predict_batch, values, model_name)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        offset = 0
+        for request_values, future in batch:
+            if not future.done():
+                future.set_result(labels[offset:offset + len(request_values)])
+            offset += len(request_values)
+
+
+class _BatchState:
+    """Queues of the requests of an event loop."""
+
+    def __init__(self):
+        self.pending = dict()
+        self.sizes = dict()
+        self.timers = dict()
+        self.tasks = set()
@@ -0,0 +1,123 @@
+"""
+JSON encoding and decoding of the requests and responses.
+
+The fastest installed backend is used: `orjson`, `ujson` or, if none of them is installed, the standard `json` module.
+"""
+
+import json
+
+from django.http import HttpResponse
+
+
+# Backends in order of preference
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+class JSONCodec:
+    """Encodes and decodes JSON with one of the `BACKENDS`.
+
+    The documents are decoded from bytes and encoded to bytes, which is what the requests and responses contain, so no intermediate string is built.
+
+    """
+
+    def __init__(self, backend: str = 'auto'):
+        """
+        Args:
+            backend (str, optional):
+                Name of the backend (one of `BACKENDS`), or 'auto' to use the first installed one. Defaults to 'auto'.
+
+        Raises:
+            ValueError:
+                If the backend is not supported or it is not installed.
+
+        """
+        if backend == 'auto':
+            for name in BACKENDS:
+                try:
+                    self._set_backend(name)
+                    break
+                except ImportError:
+                    continue
+        elif backend in BACKENDS:
+            try:
+                self._set_backend(backend)
+            except ImportError:
+                raise ValueError(f'JSON backend is not installed: {backend}')
+        else:
+            raise ValueError(f'Unsupported JSON backend: {backend}')
+
+    def _set_backend(self, name: str) -> None:
+        """Selects the functions of a backend.
+
+        Args:
+            name (str):
+                Name of the backend.
+
+        Raises:
+            ImportError:
+                If the backend is not installed.
+
+        """
+        if name == 'orjson':
+            import orjson
+            self._loads = orjson.loads
+            self._dumps = orjson.dumps
+        elif name == 'ujson':
+            import ujson
+            self._loads = ujson.loads
+            self._dumps = lambda obj: ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+        else:
+            self._loads = json.loads
+            self._dumps = lambda obj: json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+        self.backend = name
+
+    def loads(self, data: bytes) -> object:
+        """Decodes a JSON document.
+
+        Args:
+            data (bytes):
+                The UTF-8 encoded document.
+
+        Raises:
+            ValueError:
+                If the document is not valid JSON or UTF-8.
+
+        Returns:
+            object:
+                The decoded document.
+
+        """
+        return self._loads(data)
+
+    def dumps(self, obj: object) -> bytes:
+        """Encodes an object as a JSON document.
+
+        Args:
+            obj (object):
+                The object to encode. Only the JSON types (dict, list, tuple, str, int, float, bool and None) are supported.
+
+        Returns:
+            bytes:
+                The UTF-8 encoded document.
+
+        """
+        return self._dumps(obj)
+
+    def response(self, data: object, status: int = 200, content_type: str = 'application/json') -> HttpResponse:
+        """Builds an HTTP response with an object encoded as JSON.
+
+        Args:
+            data (object):
+                The content of the response.
+            status (int, optional):
+                The status code. Defaults to 200.
+            content_type (str, optional):
+                The media type of the response. Defaults to 'application/json'.
+
+        Returns:
+            HttpResponse:
+                The response.
+
+        """
+        return HttpResponse(self.dumps(data), status=status, content_type=content_type)
@@ -0,0 +1,192 @@
+"""
+Compact encodings of the classification results.
+
+Instead of a [value, classification] pair per value, the classifications are encoded as small integer codes that index a list of labels.
+"""
+
+import io
+
+import numpy as np
+
+
+# Supported response formats and their media types
+FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.cls.columnar+json',
+    'rle': 'application/vnd.cls.rle+json',
+    'npy': 'application/x-npy',
+}
+
+
+def response_format(request) -> str:
+    """Chooses the format of the response of a request.
+
+    The `format` query parameter has priority. Otherwise, the first media type of the `Accept` header that matches a format is used.
+
+    Args:
+        request (HttpRequest):
+            HTTP request object.
+
+    Raises:
+        ValueError:
+            If the `format` query parameter is not a supported format.
+
+    Returns:
+        str:
+            The name of the format (a key of `FORMATS`). 'json' by default.
+
+    """
+    name = request.GET.get('format')
+    if name is not None:
+        if name not in FORMATS:
+            raise ValueError(f'Unsupported format: {name}')
+        return name
+
+    for media_range in request.headers.get('Accept', '').split(','):
+        media_type = media_range.split(';')[0].strip()
+        for name, content_type in FORMATS.items():
+            if media_type == content_type:
+                return name
+
+    return 'json'
+
+
+def encode_labels(labels: np.ndarray, classes: list[str]) -> np.ndarray[np.uint8]:
+    """Encodes the classifications as indexes of a sorted list of labels.
+
+    Args:
+        labels (np.ndarray):
+            The classifications.
+        classes (list[str]):
+            The sorted list of possible classifications.
+
+    Returns:
+        np.ndarray[np.uint8]:
+            The index of each classification in `classes`.
+
+    """
+    return np.searchsorted(np.asarray(classes), labels).astype(np.uint8)
+
+
+def columnar_result(values: object, classes: list[str], codes: np.ndarray[np.uint8]) -> dict:
+    """Builds the result of the columnar format: parallel arrays of values and label codes.
+
+    Args:
+        values (object):
+            The classified values: a list, or the range object of the request.
+        classes (list[str]):
+            The labels indexed by the codes.
+        codes (np.ndarray[np.uint8]):
+            The code of the classification of each value.
+
+    Returns:
+        dict:
+            Dictionary with the keys 'values', 'labels' and 'codes'.
+
+    """
+    return {
+        'values': values,
+        'labels': classes,
+        'codes': codes.tolist(),
+    }
+
+
+def rle_result(values: object, classes: list[str], codes: np.ndarray[np.uint8]) -> dict:
+    """Builds the result of the periodic run-length format: the runs of one cycle of the label codes and the number of codes.
+
+    The classifications of evenly spaced values repeat with a short period (15 values for FizzBuzz), so only the first cycle
+    (the shortest prefix that repeats up to the end, see `shortest_period`) is encoded, as [code, length] runs. The code of the
+    i-th value is the one of the position `i % period` of the cycle, where the period is the sum of the lengths of the runs.
+
+    Args:
+        values (object):
+            The classified values: a list, or the range object of the request.
+        classes (list[str]):
+            The labels indexed by the codes.
+        codes (np.ndarray[np.uint8]):
+            The code of the classification of each value.
+
+    Returns:
+        dict:
+            Dictionary with the keys 'values', 'labels', 'length' (number of codes) and 'runs' (of the first cycle).
+
+    """
+    return {
+        'values': values,
+        'labels': classes,
+        'length': len(codes),
+        'runs': run_lengths(codes[:shortest_period(codes)]),
+    }
+
+
+def shortest_period(codes: np.ndarray[np.uint8], max_period: int = 4096) -> int:
+    """Finds the length of the shortest prefix of a sequence that, repeated, gives the whole sequence.
+
+    The last repetition can be incomplete. Periods longer than `max_period` are not searched (the whole sequence is its own period).
+    The shortest period of the first `2 * max_period` codes is searched first: by the periodicity lemma (Fine and Wilf), a shorter
+    period of the whole sequence is a multiple of it, and then it is also a period of the whole sequence, so only that one is checked
+    on the whole sequence.
+
+    Args:
+        codes (np.ndarray[np.uint8]):
+            The sequence of codes.
+        max_period (int, optional):
+            The longest period searched. Defaults to 4096.
+
+    Returns:
+        int:
+            The period, or the length of the sequence if it does not repeat.
+
+    """
+    n = len(codes)
+    prefix = codes[:2 * max_period]
+
+    for period in range(1, min(max_period, n - 1) + 1):
+        # A short comparison discards most of the periods before comparing the whole prefix
+        head = min(len(prefix) - period, _PERIOD_CHECK)
+        if np.array_equal(prefix[period:period + head], prefix[:head]) and np.array_equal(prefix[period:], prefix[:len(prefix) - period]):
+            return period if np.array_equal(codes[period:], codes[:n - period]) else n
+
+    return n
+
+
+# Number of codes compared to discard a period before comparing the whole prefix (see `shortest_period`)
+_PERIOD_CHECK = 64
+
+
+def run_lengths(codes: np.ndarray[np.uint8]) -> list[list[int]]:
+    """Encodes a sequence of codes as runs of equal consecutive codes.
+
+    Args:
+        codes (np.ndarray[np.uint8]):
+            The sequence of codes.
+
+    Returns:
+        list[list[int]]:
+            The [code, length] pair of each run, in order.
+
+    """
+    if len(codes) == 0:
+        return []
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+    lengths = np.diff(np.append(starts, len(codes)))
+
+    return np.column_stack((codes[starts], lengths)).tolist()
+
+
+def npy_content(codes: np.ndarray[np.uint8]) -> bytes:
+    """Serializes the label codes as a `.npy` file.
+
+    Args:
+        codes (np.ndarray[np.uint8]):
+            The code of the classification of each value.
+
+    Returns:
+        bytes:
+            Content of the `.npy` file (a little-endian uint8 array).
+
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, codes.astype('<u1'), allow_pickle=False)
+    return buffer.getvalue()
@@ -0,0 +1,112 @@
+"""
+Hot reload of the models.
+
+A directory written by `MyClassifier.save_models` is watched, and the models are reloaded every time its manifest changes.
+"""
+
+import os
+import threading
+from os import path
+
+from logic.classifier import MANIFEST_NAME
+
+
+class ModelWatcher:
+    """Thread that polls the manifest of a models directory and calls a function when it changes.
+
+    The manifest is the last file written by `MyClassifier.save_models`, so a change means that a complete set of models is available.
+    The directory can also be a symbolic link that is pointed (atomically) to a new directory.
+
+    """
+
+    def __init__(self, dir_path: str, reload: callable, interval: float = 5.0):
+        """
+        Args:
+            dir_path (str):
+                The path of the watched directory.
+            reload (callable):
+                Function without arguments that loads the models of the directory.
+            interval (float, optional):
+                Seconds between two checks of the manifest. Defaults to 5.0.
+
+        """
+        self.dir_path = dir_path
+        self.reload = reload
+        self.interval = interval
+        self.signature = manifest_signature(dir_path)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+
+    def start(self) -> None:
+        """Starts watching the directory."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops watching the directory and waits for the thread to end."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def check(self, force: bool = False) -> bool:
+        """Reloads the models if the manifest changed since the last reload.
+
+        If the reload fails, the previous models are kept and the reload is tried again in the next check.
+
+        Args:
+            force (bool, optional):
+                If True, the models are reloaded even if the manifest did not change. Defaults to False.
+
+        Raises:
+            FileNotFoundError:
+                If `force` is True and the directory has no manifest.
+            Exception:
+                Any error raised by `reload`.
+
+        Returns:
+            bool:
+                True if the models were reloaded.
+
+        """
+        with self._lock:
+            signature = manifest_signature(self.dir_path)
+            if signature is None:
+                if force:
+                    raise FileNotFoundError(f'Models manifest not found in {self.dir_path}')
+                return False
+            if signature == self.signature and not force:
+                return False
+
+            self.reload()
+
+            self.signature = signature
+            print(f'### MODELS RELOADED ({self.dir_path}) ###')
+            return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as error:
+                print(f'### MODELS NOT RELOADED ({self.dir_path}): {error} ###')
+
+
+def manifest_signature(dir_path: str) -> tuple[str, int, int, int]:
+    """Identifies the current version of the manifest of a models directory.
+
+    Args:
+        dir_path (str):
+            The path of the directory (or of a symbolic link to it).
+
+    Returns:
+        tuple[str, int, int, int]:
+            The real path of the directory and the inode, modification time (ns) and size of the manifest, or None if there is no manifest.
+
+    """
+    real_path = path.realpath(dir_path)
+    try:
+        stat = os.stat(path.join(real_path, MANIFEST_NAME))
+    except OSError:
+        return None
+
+    return real_path, stat.st_ino, stat.st_mtime_ns, stat.st_size
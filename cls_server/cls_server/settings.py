@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "logic",
     "tests",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
@@ -117,3 +119,78 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Number classifier
+
+# Integer ranges (start, end, step) used to train and test the models
+CLS_TRAIN_PARAMETERS = (1000, 2000, 1)
+CLS_TEST_PARAMETERS = (1, 100, 1)
+
+# Registered preprocessor (see logic.dataset.preprocessors) that transforms the numbers into the features of the models
+CLS_PREPROCESSOR = os.environ.get("CLS_PREPROCESSOR", "number2remainder")
+
+# Directory where trained models are cached, keyed by the training configuration.
+# If it is not defined, the models are trained every time the server starts.
+CLS_MODEL_CACHE_DIR = os.environ.get("CLS_MODEL_CACHE_DIR")
+
+# Number of workers used to cross-validate the candidate models (-1 uses all the processors), and kind of pool ("process" or "thread")
+CLS_TRAINING_JOBS = int(os.environ.get("CLS_TRAINING_JOBS", 1))
+CLS_TRAINING_BACKEND = os.environ.get("CLS_TRAINING_BACKEND", "process")
+
+# Train the models on the unique (features, label) rows, weighted by their number of occurrences (models without sample weights use all the rows)
+CLS_TRAINING_DEDUPE = os.environ.get("CLS_TRAINING_DEDUPE", "0") == "1"
+
+# How the candidate models are selected: "exhaustive" (10-fold cross-validation of all of them) or "halving" (all of them are evaluated on
+# CLS_HALVING_MIN_FOLDS folds, and only the best 1 / CLS_HALVING_FACTOR, or the ones within CLS_HALVING_TOLERANCE of the best, on more folds)
+CLS_MODEL_SELECTION = os.environ.get("CLS_MODEL_SELECTION", "exhaustive")
+CLS_HALVING_FACTOR = int(os.environ.get("CLS_HALVING_FACTOR", 3))
+CLS_HALVING_MIN_FOLDS = int(os.environ.get("CLS_HALVING_MIN_FOLDS", 2))
+CLS_HALVING_TOLERANCE = float(os.environ.get("CLS_HALVING_TOLERANCE", 0.0))
+
+# Replace the trained models by lookup tables over their boolean feature space (same predictions, without calling scikit-learn)
+CLS_COMPILE_MODELS = os.environ.get("CLS_COMPILE_MODELS", "0") == "1"
+
+# Requests to the async predict endpoint wait up to CLS_BATCH_WINDOW seconds (or until CLS_BATCH_MAX_VALUES values are queued) to be classified together
+CLS_BATCH_WINDOW = float(os.environ.get("CLS_BATCH_WINDOW", 0.002))
+CLS_BATCH_MAX_VALUES = int(os.environ.get("CLS_BATCH_MAX_VALUES", 10000))
+
+# In-process LRU cache of predictions (0 entries disables it). The key is the model name plus the feature vector ("features") or the raw value ("value")
+CLS_PREDICTION_CACHE_SIZE = int(os.environ.get("CLS_PREDICTION_CACHE_SIZE", 0))
+CLS_PREDICTION_CACHE_BYTES = int(os.environ["CLS_PREDICTION_CACHE_BYTES"]) if "CLS_PREDICTION_CACHE_BYTES" in os.environ else None
+CLS_PREDICTION_CACHE_KEY = os.environ.get("CLS_PREDICTION_CACHE_KEY", "features")
+
+# Number of values classified together by the streaming predict endpoint and by range requests
+CLS_STREAM_BATCH_SIZE = int(os.environ.get("CLS_STREAM_BATCH_SIZE", 10000))
+
+# Maximum number of values of a range request
+CLS_RANGE_MAX_LENGTH = int(os.environ.get("CLS_RANGE_MAX_LENGTH", 100_000_000))
+
+# JSON library used to decode the requests and encode the responses ("orjson", "ujson", "json" or "auto" for the fastest installed one)
+CLS_JSON_BACKEND = os.environ.get("CLS_JSON_BACKEND", "auto")
+
+# Directory with the models published by `MyClassifier.save_models` (or a symbolic link to it). If it is defined, the models are
+# loaded from it at startup, and reloaded every CLS_RELOAD_INTERVAL seconds (0 disables the polling) when its manifest changes
+CLS_RELOAD_DIR = os.environ.get("CLS_RELOAD_DIR")
+CLS_RELOAD_INTERVAL = float(os.environ.get("CLS_RELOAD_INTERVAL", 5.0))
+
+# Token required by the admin endpoints (Authorization: Bearer <token>). If it is not defined, they are disabled
+CLS_ADMIN_TOKEN = os.environ.get("CLS_ADMIN_TOKEN")
+
+# Training jobs of the train endpoint (enabled with CLS_RELOAD_DIR, where they publish the models). Each job runs in a process with the
+# idle scheduling policy (or, where it is not available, with the nice value increased by CLS_RETRAIN_NICE) and cross-validates the
+# candidate models with CLS_RETRAIN_JOBS workers. At most CLS_RETRAIN_MAX_PENDING jobs wait while another one runs
+CLS_RETRAIN_JOBS = int(os.environ.get("CLS_RETRAIN_JOBS", 1))
+CLS_RETRAIN_NICE = int(os.environ.get("CLS_RETRAIN_NICE", 10))
+CLS_RETRAIN_MAX_PENDING = int(os.environ.get("CLS_RETRAIN_MAX_PENDING", 4))
+
+# Worker processes that predict the large batches (0 disables them, so the batches are predicted in the request thread).
+# Batches of at least CLS_INFERENCE_MIN_CHUNK values are sent to the workers and split among them. At most CLS_INFERENCE_MAX_PENDING
+# batches are in the workers at the same time, and a batch waits up to CLS_INFERENCE_TIMEOUT seconds for a place and for its prediction
+CLS_INFERENCE_WORKERS = int(os.environ.get("CLS_INFERENCE_WORKERS", 0))
+CLS_INFERENCE_MIN_CHUNK = int(os.environ.get("CLS_INFERENCE_MIN_CHUNK", 10000))
+CLS_INFERENCE_MAX_PENDING = int(os.environ.get("CLS_INFERENCE_MAX_PENDING", 16))
+CLS_INFERENCE_TIMEOUT = float(os.environ.get("CLS_INFERENCE_TIMEOUT", 30.0))
+
+# The ensemble calls the models from the fastest to the slowest and stops when the remaining ones cannot change the vote (same results)
+CLS_EARLY_EXIT = os.environ.get("CLS_EARLY_EXIT", "0") == "1"
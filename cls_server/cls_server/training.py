@@ -0,0 +1,294 @@
+"""
+Background retraining of the models.
+
+The training jobs are queued and run one at a time, each one in a separate process with the lowest scheduling priority, so the
+server keeps answering the predictions with the same latency while the models are trained on the same host. The models of a
+finished job are published with `MyClassifier.save_models` (in the reload directory, so the server loads them).
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from logic.classifier import MODEL_PARAMETERS, MyClassifier
+from logic.classifier.pool import _exit_with_parent
+from logic.dataset.numbers import check_range, load
+
+
+class TrainingJobs:
+    """Queue of training jobs that run in a background process and publish their models in a directory.
+
+    Each job is described by a dictionary with its 'id', 'status' ('queued', 'running', 'succeeded' or 'failed'), the 'request'
+    (ranges of the datasets and candidate models), the current 'stage' of the training ('loading', 'evaluation', 'training' or
+    'saving') with the 'done' and 'total' steps of the stage, the published 'models', the 'error' of a failed job and the times
+    at which it was 'created', 'started' and 'finished'. A job succeeds when its models are published: if they cannot be loaded
+    afterwards (`on_success` fails), the error is reported in 'reload_error', and the job is finished after the attempt.
+
+    """
+
+    def __init__(self, dir_path: str, options: dict = None, on_success: callable = None, niceness: int = 10,
+                 max_pending: int = 4, history: int = 100):
+        """
+        Args:
+            dir_path (str):
+                The directory where the models of the jobs are published.
+            options (dict, optional):
+                Keyword arguments of the `MyClassifier` that is trained by the jobs (n_jobs, dedupe, selection, preprocessor, ...).
+            on_success (callable, optional):
+                Function without arguments called in this process after a job publishes its models (to load them). Defaults to None.
+            niceness (int, optional):
+                Increment of the nice value of the training processes, used where the idle scheduling policy is not available. Defaults to 10.
+            max_pending (int, optional):
+                Maximum number of queued jobs (besides the running one). Defaults to 4.
+            history (int, optional):
+                Number of finished jobs whose status is kept. Defaults to 100.
+
+        """
+        self.dir_path = dir_path
+        self.options = options or {}
+        self.on_success = on_success
+        self.niceness = niceness
+        self.history = history
+        self._jobs = dict()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, name='training-jobs', daemon=True)
+        self._thread.start()
+
+    def submit(self, train_parameters: tuple[int, int, int], test_parameters: tuple[int, int, int], models: list[str] = None) -> dict:
+        """Queues a training job.
+
+        Args:
+            train_parameters (tuple[int, int, int]):
+                The range of the training data (start, end, step).
+            test_parameters (tuple[int, int, int]):
+                The range of the testing data (start, end, step).
+            models (list[str], optional):
+                The candidate models (see `MODEL_PARAMETERS`). The best ones are published. If None, all of them.
+
+        Raises:
+            ValueError:
+                If a range or a model name is not valid.
+            RuntimeError:
+                If there are already `max_pending` queued jobs.
+
+        Returns:
+            dict:
+                The status of the new job.
+
+        """
+        train_parameters, test_parameters = tuple(train_parameters), tuple(test_parameters)
+        check_range(train_parameters, 'training')
+        check_range(test_parameters, 'testing')
+
+        models = list(MODEL_PARAMETERS) if models is None else list(models)
+        if not models:
+            raise ValueError('At least one model is required.')
+        unknown = [model_name for model_name in models if model_name not in MODEL_PARAMETERS]
+        if unknown:
+            raise ValueError(f"Unknown models: {', '.join(map(str, unknown))}")
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'request': {
+                'train_parameters': list(train_parameters),
+                'test_parameters': list(test_parameters),
+                'models': list(dict.fromkeys(models)),
+            },
+            'stage': None,
+            'done': 0,
+            'total': 0,
+            'models': None,
+            'error': None,
+            'reload_error': None,
+            'created': _now(),
+            'started': None,
+            'finished': None,
+        }
+
+        with self._lock:
+            try:
+                self._queue.put_nowait(job['id'])
+            except queue.Full:
+                raise RuntimeError('Too many queued training jobs.')
+            self._jobs[job['id']] = job
+            self._forget_finished()
+            return dict(job)
+
+    def get(self, job_id: str) -> dict:
+        """Returns the status of a job, or None if there is no job with that id."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self) -> list[dict]:
+        """Returns the status of the known jobs, from the oldest to the newest."""
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()]
+
+    def wait(self, job_id: str, timeout: float = None) -> dict:
+        """Waits until a job finishes (including the load of the models of a job that succeeded).
+
+        Args:
+            job_id (str):
+                The id of the job.
+            timeout (float, optional):
+                Maximum seconds to wait. If None, there is no limit.
+
+        Raises:
+            TimeoutError:
+                If the job did not finish in time.
+
+        Returns:
+            dict:
+                The status of the job.
+
+        """
+        with self._changed:
+            finished = self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id]['finished'] is not None, timeout)
+            if not finished:
+                raise TimeoutError(f'Training job {job_id} did not finish in {timeout} seconds')
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._changed:
+            self._jobs[job_id].update(fields)
+            self._changed.notify_all()
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished'] is not None]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id)
+            except Exception as error:
+                self._update(job_id, status='failed', error=str(error), finished=_now())
+            print(f"### TRAINING JOB {job_id} {self.get(job_id)['status'].upper()} ###")
+
+    def _run_job(self, job_id: str) -> None:
+        """Runs a job in a new process and follows its events until it ends."""
+        request = self.get(job_id)['request']
+        self._update(job_id, status='running', started=_now())
+
+        context = multiprocessing.get_context('spawn')
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_train,
+            args=(sender, self.dir_path, self.options, request, job_id, self.niceness),
+            name=f'training-{job_id}',
+        )
+        process.start()
+        sender.close()
+
+        result = dict()
+        with receiver:
+            while True:
+                try:
+                    event = receiver.recv()
+                except EOFError:
+                    break
+                if 'stage' in event:
+                    self._update(job_id, **event)
+                else:
+                    result = event
+        process.join()
+
+        if 'models' not in result:
+            error = result.get('error') or f'The training process ended with exit code {process.exitcode}'
+            self._update(job_id, status='failed', error=error, finished=_now())
+            return
+
+        # The models are published (and may already be served), whether they can be loaded now or not
+        self._update(job_id, status='succeeded', models=result['models'])
+        try:
+            if self.on_success is not None:
+                self.on_success()
+        except Exception as error:
+            self._update(job_id, reload_error=str(error))
+        finally:
+            self._update(job_id, finished=_now())
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def _train(connection, dir_path: str, options: dict, request: dict, job_id: str, niceness: int) -> None:
+    """Trains the models of a job and publishes them (runs in the training process).
+
+    The events sent through the connection are the progress of the training ({'stage', 'done', 'total'}) and, at the end,
+    the published models ({'models'}) or the error ({'error'}).
+
+    Args:
+        connection (Connection):
+            The connection with the server process.
+        dir_path (str):
+            The directory where the models are published.
+        options (dict):
+            Keyword arguments of the classifier.
+        request (dict):
+            The ranges of the datasets and the candidate models.
+        job_id (str):
+            The id of the job, saved in the metadata of the models.
+        niceness (int):
+            Increment of the nice value of the process.
+
+    """
+    # The process ends if the server ends, instead of publishing models that nobody expects
+    threading.Thread(target=_exit_with_parent, args=(multiprocessing.parent_process(),), daemon=True).start()
+    _lower_priority(niceness)
+
+    from threadpoolctl import threadpool_limits
+
+    def progress(stage: str, done: int, total: int) -> None:
+        connection.send({'stage': stage, 'done': done, 'total': total})
+
+    try:
+        # One thread per process: the parallelism of the training is the one of the `n_jobs` option
+        with threadpool_limits(1):
+            classifier = MyClassifier(**options)
+            classifier.generic_models = request['models']
+
+            progress('loading', 0, 1)
+            dataset = load(tuple(request['train_parameters']), tuple(request['test_parameters']), classifier.preprocessor)
+            progress('loading', 1, 1)
+
+            classifier.build_models(dataset, progress=progress)
+
+            progress('saving', 0, 1)
+            classifier.save_models(dir_path, metadata={'job': job_id, **request})
+            progress('saving', 1, 1)
+
+        connection.send({'models': classifier.models_name()})
+    except Exception as error:
+        connection.send({'error': f'{type(error).__name__}: {error}'})
+    finally:
+        connection.close()
+
+
+def _lower_priority(niceness: int) -> None:
+    """Gives the current process (and its future children) the lowest scheduling priority available.
+
+    With the idle policy of Linux, the process only runs on the processors that no other process needs.
+
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError):
+        pass
+
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass
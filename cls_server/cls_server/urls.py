@@ -22,7 +22,13 @@ from . import views_cls
 urlpatterns = [
     # path("admin/", admin.site.urls),
     path('api/number-classifier/predict/', views_cls.predict_data , name='predict_data'),
+    path('api/number-classifier/predict_async/', views_cls.predict_data_async , name='predict_data_async'),
+    path('api/number-classifier/predict_stream/', views_cls.predict_data_stream , name='predict_data_stream'),
     path('api/number-classifier/list_models/', views_cls.list_classifiers , name='list_classifiers'),
+    path('api/number-classifier/reload_models/', views_cls.reload_models , name='reload_models'),
+    path('api/number-classifier/train/', views_cls.train_models , name='train_models'),
+    path('api/number-classifier/train/<str:job_id>/', views_cls.training_job , name='training_job'),
+    path('metrics', views_cls.metrics , name='metrics'),
 ]
     
 
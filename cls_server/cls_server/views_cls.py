@@ -1,69 +1,593 @@
 from django.shortcuts import render
 
-import json
-from django.http import JsonResponse
+import atexit
+import hashlib
+import hmac
+import shutil
+import tempfile
+import time
+import numpy as np
+from django.conf import settings
 from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import condition
 
-from logic.classifier import MyClassifier
-from logic.dataset.numbers import load, number2remainder
+from logic.classifier import InferencePool, MyClassifier, build_or_load_models
+from logic.dataset.numbers import check_range, iter_range, load
+from logic.metrics import REGISTRY, SIZE_BUCKETS
 
-classifier = MyClassifier()
-classifier.build_models(load((1000, 2000, 1), (1, 100, 1)))
+from .batching import PredictionBatcher
+from .codec import JSONCodec
+from .formats import FORMATS, columnar_result, encode_labels, npy_content, response_format, rle_result
+from .reloading import ModelWatcher, manifest_signature
+from .training import TrainingJobs
+
+codec = JSONCodec(settings.CLS_JSON_BACKEND)
+
+REQUEST_STAGE_SECONDS = REGISTRY.histogram(
+    'cls_request_stage_seconds', 'Time of each stage (parse, validate, predict, serialize) of the predict requests.', ('endpoint', 'stage'))
+REQUEST_VALUES = REGISTRY.histogram(
+    'cls_request_values', 'Number of values of the predict requests.', ('endpoint',), SIZE_BUCKETS)
+REQUEST_BYTES = REGISTRY.histogram(
+    'cls_request_bytes', 'Size of the body of the predict requests.', ('endpoint',), SIZE_BUCKETS)
+
+# Body and ETag of the list_models response, updated every time the models change
+models_response = (b'', '')
+
+def _update_models_response(classifier: MyClassifier) -> None:
+    """Serializes the response of list_models for the current models
+
+    Args:
+        classifier (MyClassifier): 
+            The classifier whose models changed.
+    """
+    global models_response
+    
+    body = codec.dumps({
+            'success': True, 
+            'result': {
+                'models': classifier.models_name()
+            }
+        })
+    
+    models_response = (body, hashlib.sha256(body).hexdigest())
+
+classifier = MyClassifier(
+    n_jobs=settings.CLS_TRAINING_JOBS, 
+    backend=settings.CLS_TRAINING_BACKEND,
+    dedupe=settings.CLS_TRAINING_DEDUPE,
+    selection=settings.CLS_MODEL_SELECTION,
+    halving_factor=settings.CLS_HALVING_FACTOR,
+    halving_min_folds=settings.CLS_HALVING_MIN_FOLDS,
+    halving_tolerance=settings.CLS_HALVING_TOLERANCE,
+    preprocessor=settings.CLS_PREPROCESSOR,
+    cache_size=settings.CLS_PREDICTION_CACHE_SIZE,
+    cache_bytes=settings.CLS_PREDICTION_CACHE_BYTES,
+    cache_key=settings.CLS_PREDICTION_CACHE_KEY,
+    early_exit=settings.CLS_EARLY_EXIT
+)
+classifier.add_models_listener(_update_models_response)
+
+# Worker processes of the inference pool (see CLS_INFERENCE_WORKERS)
+pool = None
+
+def _reload_models() -> None:
+    """Replaces the models by the ones saved in the reload directory (`CLS_RELOAD_DIR`)"""
+    global classifier
+    
+    classifier.load_models(settings.CLS_RELOAD_DIR, lazy=False, replace=True)
+    if settings.CLS_COMPILE_MODELS:
+        classifier.compile_models()
+    
+    if pool is not None:
+        pool.dir_path = settings.CLS_RELOAD_DIR
+        pool.restart()
+
+if settings.CLS_RELOAD_DIR and manifest_signature(settings.CLS_RELOAD_DIR) is not None:
+    _reload_models()
+else:
+    if settings.CLS_MODEL_CACHE_DIR:
+        build_or_load_models(classifier, settings.CLS_TRAIN_PARAMETERS, settings.CLS_TEST_PARAMETERS, settings.CLS_MODEL_CACHE_DIR)
+    else:
+        classifier.build_models(load(settings.CLS_TRAIN_PARAMETERS, settings.CLS_TEST_PARAMETERS, classifier.preprocessor))
+    if settings.CLS_COMPILE_MODELS:
+        classifier.compile_models()
+
+if settings.CLS_INFERENCE_WORKERS > 0:
+    if settings.CLS_RELOAD_DIR and manifest_signature(settings.CLS_RELOAD_DIR) is not None:
+        pool_dir = settings.CLS_RELOAD_DIR
+    else:
+        # The workers load the models from a directory, which is removed when the server ends
+        pool_dir = tempfile.mkdtemp(prefix='cls-models-')
+        atexit.register(shutil.rmtree, pool_dir, ignore_errors=True)
+        classifier.save_models(pool_dir)
+    
+    pool = InferencePool(
+        pool_dir, 
+        n_workers=settings.CLS_INFERENCE_WORKERS, 
+        max_pending=settings.CLS_INFERENCE_MAX_PENDING, 
+        timeout=settings.CLS_INFERENCE_TIMEOUT, 
+        min_chunk=settings.CLS_INFERENCE_MIN_CHUNK, 
+        compile_models=settings.CLS_COMPILE_MODELS
+    )
+    pool.warm_up()
+
+def _predict_batch(values: np.ndarray[np.int64], model_name: str = None) -> np.ndarray:
+    """Classifies a batch of values, in the inference pool if it is enabled and the batch is large enough
+
+    Args:
+        values (np.ndarray[np.int64]): 
+            Array of values to classify.
+        model_name (str, optional): 
+            Name of the model to use for classification. If None, the most common classification of all models is used.
+
+    Returns:
+        np.ndarray: 
+            The classification of each value.
+    """
+    global classifier, pool
+    
+    if pool is not None and len(values) >= settings.CLS_INFERENCE_MIN_CHUNK:
+        return pool.predict_batch(values, model_name)
+    
+    return classifier.predict_batch(values, model_name=model_name)
+
+watcher = None
+if settings.CLS_RELOAD_DIR:
+    watcher = ModelWatcher(settings.CLS_RELOAD_DIR, _reload_models, settings.CLS_RELOAD_INTERVAL)
+    if settings.CLS_RELOAD_INTERVAL > 0:
+        watcher.start()
+
+# Training jobs that publish their models in the reload directory, where they are loaded from when the job finishes
+training_jobs = None
+if settings.CLS_RELOAD_DIR:
+    training_jobs = TrainingJobs(
+        settings.CLS_RELOAD_DIR,
+        options=dict(
+            n_jobs=settings.CLS_RETRAIN_JOBS,
+            backend=settings.CLS_TRAINING_BACKEND,
+            dedupe=settings.CLS_TRAINING_DEDUPE,
+            selection=settings.CLS_MODEL_SELECTION,
+            halving_factor=settings.CLS_HALVING_FACTOR,
+            halving_min_folds=settings.CLS_HALVING_MIN_FOLDS,
+            halving_tolerance=settings.CLS_HALVING_TOLERANCE,
+            preprocessor=settings.CLS_PREPROCESSOR
+        ),
+        on_success=watcher.check,
+        niceness=settings.CLS_RETRAIN_NICE,
+        max_pending=settings.CLS_RETRAIN_MAX_PENDING
+    )
+
+batcher = PredictionBatcher(
+    _predict_batch,
+    settings.CLS_BATCH_WINDOW,
+    settings.CLS_BATCH_MAX_VALUES
+)
 
 
 def predict_data(request):
     """
     Web request to classify a set of numbers
 
+    The response format is chosen with the `format` query parameter or the `Accept` header (see `formats.FORMATS`). 
+    By default, it is a JSON list of [value, classification] pairs.
+
+    Args:
+        request (HttpRequest): 
+            HTTP request object.
+
+    Returns:
+        HttpResponse: 
+            JSON response with a dictionary as content.
+    """
+
+    REQUEST_BYTES.observe(len(request.body), endpoint='predict')
+    
+    try:
+        with REQUEST_STAGE_SECONDS.time(endpoint='predict', stage='parse'):
+            data = codec.loads(request.body)
+    except ValueError:
+        return codec.response({'error': 'Request body does not contain valid JSON.'}, status=400)
+
+    try:
+        with REQUEST_STAGE_SECONDS.time(endpoint='predict', stage='validate'):
+            _valid_structure(data) 
+        response_format_name = response_format(request)
+    except Exception as error:
+        return codec.response({
+            'success': False, 
+            'result': {
+                'error_msg': str(error)
+            }
+        })
+    
+    REQUEST_VALUES.observe(_values_count(data), endpoint='predict')
+
+    if response_format_name != 'json':
+        return _compact_response(data, response_format_name)
+
+    if 'range' in data:
+        return StreamingHttpResponse(
+            _stream_range(_range_parameters(data['range']), data.get('model_name'), settings.CLS_STREAM_BATCH_SIZE), 
+            content_type='application/json'
+        )
+
+    with REQUEST_STAGE_SECONDS.time(endpoint='predict', stage='predict'):
+        result = _process_logic(data)
+    
+    with REQUEST_STAGE_SECONDS.time(endpoint='predict', stage='serialize'):
+        return codec.response(result)
+
+async def predict_data_async(request):
+    """
+    Web request to classify a set of numbers, coalescing concurrent requests
+
+    The values of the requests received in a short window of time are classified as a single batch (see `PredictionBatcher`). 
+    It is meant to be served by an ASGI server.
+
     Args:
         request (HttpRequest): 
             HTTP request object.
 
     Returns:
-        JsonResponse: 
+        HttpResponse: 
             JSON response with a dictionary as content.
     """
 
+    REQUEST_BYTES.observe(len(request.body), endpoint='predict_async')
+    
     try:
-        data = json.loads(request.body.decode('utf-8'))
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Request body does not contain valid JSON.'}, status=400)
+        with REQUEST_STAGE_SECONDS.time(endpoint='predict_async', stage='parse'):
+            data = codec.loads(request.body)
+    except ValueError:
+        return codec.response({'error': 'Request body does not contain valid JSON.'}, status=400)
 
     try:
-        _valid_structure(data) 
+        with REQUEST_STAGE_SECONDS.time(endpoint='predict_async', stage='validate'):
+            _valid_structure(data, allow_range=False) 
     except Exception as error:
-        return JsonResponse({
+        return codec.response({
             'success': False, 
             'result': {
                 'error_msg': str(error)
             }
         })
+    
+    REQUEST_VALUES.observe(_values_count(data), endpoint='predict_async')
 
-    return JsonResponse(_process_logic(data))
+    with REQUEST_STAGE_SECONDS.time(endpoint='predict_async', stage='predict'):
+        result = await _process_logic_async(data)
+    
+    with REQUEST_STAGE_SECONDS.time(endpoint='predict_async', stage='serialize'):
+        return codec.response(result)
 
-def _valid_structure(json: dict) -> None:
+def predict_data_stream(request):
+    """
+    Web request to classify a stream of numbers
+
+    The request body is newline-delimited: each line is an integer or a JSON list of integers. The model can be chosen with the `model_name` query parameter.
+    The values are classified in batches of `CLS_STREAM_BATCH_SIZE` values while the body is read, and the response is streamed as NDJSON: 
+    one line per batch with the list of [value, classification] pairs. If a line is invalid, the values of the previous lines are classified 
+    and the stream ends with a line containing the error.
+
+    Args:
+        request (HttpRequest): 
+            HTTP request object.
+
+    Returns:
+        StreamingHttpResponse: 
+            NDJSON response with the classification, or JSON response with the error if the model name is not recognized.
+    """
+    global classifier
+    
+    model_name = request.GET.get('model_name')
+    if model_name is not None and model_name not in classifier.models_name():
+        return codec.response({
+            'success': False, 
+            'result': {
+                'error_msg': 'Model name is not recognized'
+            }
+        })
+
+    return StreamingHttpResponse(
+        _stream_classification(request, model_name, settings.CLS_STREAM_BATCH_SIZE), 
+        content_type='application/x-ndjson'
+    )
+
+def _stream_classification(lines, model_name: str, batch_size: int):
+    """Classifies a stream of lines in batches and produces the NDJSON lines of the response
+
+    Args:
+        lines (iterable): 
+            Lines (bytes) of the request body. Each line is an integer or a JSON list of integers. Empty lines are ignored.
+        model_name (str): 
+            Name of the model to use for classification. If None, the most common classification of all models is used.
+        batch_size (int): 
+            Number of values classified together.
+
+    Yields:
+        bytes: 
+            Lines of the response: a JSON list of [value, classification] pairs per batch, or a JSON object with the error.
+    """
+    global classifier
+    
+    batch = []
+    try:
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                chunk = codec.loads(line)
+            except ValueError:
+                raise ValueError(f'Line {number} does not contain valid JSON')
+            
+            if not isinstance(chunk, list):
+                chunk = [chunk]
+            try:
+                _valid_values(chunk, f'Line {number}: the values')
+            except AssertionError as error:
+                raise ValueError(str(error))
+            
+            batch.extend(chunk)
+            if len(batch) >= batch_size:
+                full = len(batch) - len(batch) % batch_size
+                for start in range(0, full, batch_size):
+                    yield _classification_line(batch[start:start + batch_size], model_name)
+                batch = batch[full:]
+        
+        if batch:
+            yield _classification_line(batch, model_name)
+    except Exception as error:
+        # The valid values read before the error are classified, so the client knows which ones were processed
+        if batch:
+            try:
+                yield _classification_line(batch, model_name)
+            except Exception:
+                pass
+        yield codec.dumps({
+            'success': False, 
+            'result': {
+                'error_msg': str(error)
+            }
+        }) + b'\n'
+
+def _classification_line(values: list[int], model_name: str) -> bytes:
+    """Classifies a batch of values and encodes it as a line of the NDJSON response
+
+    Args:
+        values (list[int]): 
+            List of values to classify.
+        model_name (str): 
+            Name of the model to use for classification. It can be None.
+
+    Returns:
+        bytes: 
+            JSON list of [value, classification] pairs, ended by a newline.
+    """
+    global classifier
+    
+    labels = _predict_batch(values, model_name)
+    return codec.dumps(list(zip(values, labels.tolist()))) + b'\n'
+
+def _valid_structure(json: dict, allow_range: bool = True) -> None:
     """
     Validates the structure of a JSON dictionary according to specific requirements.
 
+    The values to classify are given as a list (`values`) or, if `allow_range` is True, as a range (`range`).
+
     Args:
         json (dict): 
             The JSON dictionary to be validated.
+        allow_range (bool, optional): 
+            Whether the values can be given as a range. Defaults to True.
+
+    The list of values is replaced in `json` by the validated int64 array (see `_valid_values`), which is used for the prediction.
 
     Raises:
         AssertionError: If the structure of the dictionary is invalid.
+        ValueError: If the range is invalid.
     
     """
-    assert 'values' in json, "The 'values' key missing"
+    if 'range' in json:
+        assert allow_range, "The 'range' key is not supported by this endpoint"
+        assert 'values' not in json, "Only one of the 'values' and 'range' keys can be defined"
+        _valid_range(json['range'])
+    else:
+        assert 'values' in json, "The 'values' key missing"
 
-    values = json["values"]
-    assert isinstance(values, list), "The 'values' value must be a list"
+        values = json["values"]
+        assert isinstance(values, list), "The 'values' value must be a list"
 
-    for elemento in values:
-        assert isinstance(elemento, int), "The 'values' elements must be integers"
+        json["values"] = _valid_values(values)
 
     if 'model_name' in json:
         global classifier
         assert json['model_name'] in classifier.models_name() , "Model name is not recognized"
+
+def _valid_values(values: list, name: str = "The 'values' elements") -> np.ndarray[np.int64]:
+    """
+    Validates the list of values to classify and converts it to an array.
+
+    The types of the elements are checked at once and the list is converted in a single pass, so the cost is small even for millions of values.
+
+    Args:
+        values (list): 
+            The list of values to classify.
+        name (str, optional): 
+            Subject of the error messages. Defaults to "The 'values' elements".
+
+    Raises:
+        AssertionError: If an element is not an integer (booleans are not accepted) or it does not fit in 64 bits. The message contains the index of the first invalid element.
+            Some JSON backends decode the integers that do not fit in 64 bits as floats, so the integral floats out of the 64-bit range are reported as such.
+
+    Returns:
+        np.ndarray[np.int64]: 
+            The values as an int64 array.
+    
+    """
+    if not set(map(type, values)) <= {int}:
+        index, value = next((index, value) for index, value in enumerate(values) if type(value) is not int)
+        if type(value) is float and value.is_integer() and not -2 ** 63 <= value < 2 ** 63:
+            raise AssertionError(f"{name} must be 64-bit integers (index {index})")
+        raise AssertionError(f"{name} must be integers (index {index})")
+    
+    try:
+        return np.array(values, dtype=np.int64)
+    except OverflowError:
+        index = next(index for index, value in enumerate(values) if not -2 ** 63 <= value < 2 ** 63)
+        raise AssertionError(f"{name} must be 64-bit integers (index {index})")
+
+def _valid_range(range_data: dict) -> None:
+    """
+    Validates the range of values to classify.
+
+    Args:
+        range_data (dict): 
+            Dictionary with the keys 'start', 'stop' and, optionally, 'step' (1 by default). The stop value is not included.
+
+    Raises:
+        AssertionError: If the structure of the range is invalid or it is too long.
+        ValueError: If the range is invalid (see `check_range`).
+    
+    """
+    assert isinstance(range_data, dict), "The 'range' value must be an object"
+    assert 'start' in range_data and 'stop' in range_data, "The 'range' value must have the 'start' and 'stop' keys"
+    
+    parameters = _range_parameters(range_data)
+    for value in parameters:
+        assert type(value) is int and -2 ** 63 <= value < 2 ** 63, "The 'range' elements must be 64-bit integers"
+    
+    check_range(parameters, 'predict')
+    
+    assert len(range(*parameters)) <= settings.CLS_RANGE_MAX_LENGTH, f"The range cannot have more than {settings.CLS_RANGE_MAX_LENGTH} values"
+
+def _values_count(data: dict) -> int:
+    """
+    Gets the number of values to classify of a validated request.
+
+    Args:
+        data (dict): 
+            Validated request data, with the key 'values' or 'range'.
+
+    Returns:
+        int: 
+            The number of values.
+    
+    """
+    if 'range' in data:
+        return len(range(*_range_parameters(data['range'])))
+    return len(data['values'])
+
+def _range_parameters(range_data: dict) -> tuple[int, int, int]:
+    """
+    Gets the parameters of the range of values to classify.
+
+    Args:
+        range_data (dict): 
+            Dictionary with the keys 'start', 'stop' and, optionally, 'step'.
+
+    Returns:
+        tuple[int, int, int]: 
+            The range as (start, stop, step).
+    
+    """
+    return range_data['start'], range_data['stop'], range_data.get('step', 1)
+
+def _compact_response(data: dict, response_format_name: str) -> HttpResponse:
+    """Classifies the values of a request and encodes the result in a compact format
+
+    The classifications are encoded as indexes of the sorted list of labels of the models. Ranges are classified in chunks.
+
+    Args:
+        data (dict): 
+            Validated request data, with the key 'values' or 'range', and optionally 'model_name'.
+        response_format_name (str): 
+            Name of the format: 'columnar', 'rle' or 'npy'.
+
+    Returns:
+        HttpResponse: 
+            Response in the requested format. For 'npy', the labels indexed by the codes are sent in the `X-Labels` header (JSON list).
+    """
+    global classifier
+    
+    try:
+        with REQUEST_STAGE_SECONDS.time(endpoint='predict', stage='predict'):
+            model_name = data.get('model_name')
+            classes = classifier.classes()
+            
+            if 'range' in data:
+                parameters = _range_parameters(data['range'])
+                values = {'start': parameters[0], 'stop': parameters[1], 'step': parameters[2]}
+                
+                codes = np.empty(len(range(*parameters)), dtype=np.uint8)
+                offset = 0
+                for chunk in iter_range(parameters, settings.CLS_STREAM_BATCH_SIZE):
+                    codes[offset:offset + len(chunk)] = encode_labels(_predict_batch(chunk, model_name), classes)
+                    offset += len(chunk)
+            else:
+                values = data['values']
+                codes = encode_labels(_predict_batch(values, model_name), classes)
+                values = values.tolist()
+    except Exception as error:
+        return codec.response({
+            'success': False, 
+            'result': {
+                'error_msg': str(error)
+            }
+        })
+    
+    with REQUEST_STAGE_SECONDS.time(endpoint='predict', stage='serialize'):
+        if response_format_name == 'npy':
+            response = HttpResponse(npy_content(codes), content_type=FORMATS['npy'])
+            response['X-Labels'] = codec.dumps(classes).decode('utf-8')
+            return response
+        
+        result = columnar_result(values, classes, codes) if response_format_name == 'columnar' else rle_result(values, classes, codes)
+        
+        return codec.response({'success': True, 'result': result}, content_type=FORMATS[response_format_name])
+
+def _stream_range(parameters: tuple[int, int, int], model_name: str, chunk_size: int):
+    """Classifies a range of values in chunks and produces the JSON response
+
+    The response has the same content as the one of `_process_logic`, but the range is never built as a list. 
+    The `success` key is sent last: if a chunk fails after the response started, the document is closed with `success` false 
+    and the `error_msg` of the result (the classification of the previous chunks is kept). The time spent predicting the chunks 
+    (not sending them) is recorded as the 'predict' stage of the request.
+
+    Args:
+        parameters (tuple[int, int, int]): 
+            The range as (start, stop, step).
+        model_name (str): 
+            Name of the model to use for classification. If None, the most common classification of all models is used.
+        chunk_size (int): 
+            Number of values classified together.
+
+    Yields:
+        bytes: 
+            Consecutive parts of the JSON response.
+    """
+    global classifier
+    
+    yield b'{"result": {"classification": ['
+    
+    separator = b''
+    predict_seconds = 0.0
+    try:
+        for values in iter_range(parameters, chunk_size):
+            start = time.perf_counter()
+            labels = _predict_batch(values, model_name)
+            predict_seconds += time.perf_counter() - start
+            yield separator + codec.dumps(list(zip(values.tolist(), labels.tolist())))[1:-1]
+            separator = b', '
+    except Exception as error:
+        yield b'], "error_msg": ' + codec.dumps(str(error)) + b'}, "success": false}'
+        return
+    finally:
+        REQUEST_STAGE_SECONDS.observe(predict_seconds, endpoint='predict', stage='predict')
+    
+    yield b']}, "success": true}'
     
 def _process_logic(data: dict):
     """Processes input data and returns classifications
@@ -71,7 +595,7 @@ def _process_logic(data: dict):
     Args:
         data (dict): 
             Data to process. It is expected that you will have the following keys:
-                values (list[int]): List of values to classify.
+                values (np.ndarray[np.int64]): Array of values to classify (see `_valid_values`).
                 model_name (str): Name of the model to use for classification. It is not required.
 
     Returns:
@@ -83,19 +607,47 @@ def _process_logic(data: dict):
     
     try:
         model_name = data.get('model_name')
+        values = data['values']
+        labels = _predict_batch(values, model_name)
+        result = {
+            'success': True,
+            'result':{
+                'classification': list(zip(values.tolist(), labels.tolist()))
+            }
+        }
+    except Exception as error:
+        result = {
+            'success': False, 
+            'result': {
+                'error_msg': str(error)
+            }
+        }
+    
+    return result
+
+async def _process_logic_async(data: dict):
+    """Processes input data and returns classifications, batching them with the ones of other requests
+
+    Args:
+        data (dict): 
+            Data to process. It is expected that you will have the following keys:
+                values (np.ndarray[np.int64]): Array of values to classify (see `_valid_values`).
+                model_name (str): Name of the model to use for classification. It is not required.
+
+    Returns:
+        dict: 
+            Dictionary with the key 'classification' which contains a list of tuples (int, str). Each number corresponds to the one defined and the string is the classification obtained.
+
+    """
+    global batcher
+    
+    try:
+        values = data['values']
+        labels = await batcher.predict(values, data.get('model_name'))
         result = {
             'success': True,
             'result':{
-                'classification': [
-                    (
-                        value, 
-                        classifier.predict(
-                            value, 
-                            lambda x: [number2remainder(x)], 
-                            model_name
-                        )
-                    ) for value in data['values']
-                ]
+                'classification': list(zip(values.tolist(), labels.tolist()))
             }
         }
     except Exception as error:
@@ -108,9 +660,13 @@ def _process_logic(data: dict):
     
     return result
 
+@condition(etag_func=lambda request: models_response[1])
 def list_classifiers(request):
     """Lists the available classifier models
 
+    The response is serialized when the models change, and it has a strong ETag: 
+    requests with a matching `If-None-Match` header are answered with 304 (Not Modified).
+
     Args:
         request (HttpRequest): Data
 
@@ -118,18 +674,221 @@ def list_classifiers(request):
         HttpResponse: A Django HttpResponse object with the JSON response data (the names of the valid models)
   
     """
-    global classifier
+    global models_response
+    
+    response = HttpResponse(models_response[0], content_type='application/json')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
     
-    json_data = json.dumps({
+
+def reload_models(request):
+    """
+    Web request to reload the models from the reload directory (`CLS_RELOAD_DIR`)
+
+    It requires the admin token (`CLS_ADMIN_TOKEN`) in the `Authorization` header (`Bearer <token>`). 
+    The requests in progress finish with the previous models.
+
+    Args:
+        request (HttpRequest): 
+            HTTP request object.
+
+    Returns:
+        HttpResponse: 
+            JSON response with the names of the reloaded models, or with the error.
+    """
+    global watcher
+    
+    if request.method != 'POST':
+        return codec.response({'error': 'Method not allowed.'}, status=405)
+    
+    error_response = _admin_error(request, watcher is not None, 'Model reload')
+    if error_response is not None:
+        return error_response
+    
+    try:
+        watcher.check(force=True)
+    except Exception as error:
+        return codec.response({
+            'success': False, 
+            'result': {
+                'error_msg': str(error)
+            }
+        })
+    
+    return codec.response({
             'success': True, 
             'result': {
                 'models': classifier.models_name()
             }
-        }) 
+        })
+
+def train_models(request):
+    """
+    Web request to queue a training job (POST) or to list the training jobs (GET)
+
+    The job trains the models in a background process with a low priority and publishes them in the reload directory (`CLS_RELOAD_DIR`), 
+    from which they are loaded when it finishes. The body of a POST request is a JSON object with the optional keys `train_parameters` 
+    and `test_parameters` (ranges [start, end, step], by default the ones of the settings) and `models` (the candidate models, all by default).
+    It requires the admin token (`CLS_ADMIN_TOKEN`) in the `Authorization` header (`Bearer <token>`). 
+
+    Args:
+        request (HttpRequest): 
+            HTTP request object.
+
+    Returns:
+        HttpResponse: 
+            JSON response with the status of the queued job (202), or with the status of the known jobs.
+    """
+    global training_jobs
     
-    return HttpResponse(
-        json_data, 
-        content_type='application/json'
-    )
+    if request.method not in ('GET', 'POST'):
+        return codec.response({'error': 'Method not allowed.'}, status=405)
+    
+    error_response = _admin_error(request, training_jobs is not None, 'Model training')
+    if error_response is not None:
+        return error_response
+    
+    if request.method == 'GET':
+        return codec.response({'success': True, 'result': {'jobs': training_jobs.list()}})
+    
+    try:
+        data = codec.loads(request.body) if request.body else {}
+    except ValueError:
+        return codec.response({'error': 'Request body does not contain valid JSON.'}, status=400)
+    
+    try:
+        job = training_jobs.submit(*_training_request(data))
+    except ValueError as error:
+        return codec.response({'error': str(error)}, status=400)
+    except RuntimeError as error:
+        return codec.response({'error': str(error)}, status=503)
+    
+    return codec.response({'success': True, 'result': {'job': job}}, status=202)
+
+def training_job(request, job_id: str):
+    """
+    Web request to get the status of a training job (see `training.TrainingJobs`)
+
+    It requires the admin token (`CLS_ADMIN_TOKEN`) in the `Authorization` header (`Bearer <token>`). 
+
+    Args:
+        request (HttpRequest): 
+            HTTP request object.
+        job_id (str): 
+            The id of the job.
+
+    Returns:
+        HttpResponse: 
+            JSON response with the status, stage and progress of the job.
+    """
+    global training_jobs
+    
+    if request.method != 'GET':
+        return codec.response({'error': 'Method not allowed.'}, status=405)
+    
+    error_response = _admin_error(request, training_jobs is not None, 'Model training')
+    if error_response is not None:
+        return error_response
+    
+    job = training_jobs.get(job_id)
+    if job is None:
+        return codec.response({'error': 'Training job not found.'}, status=404)
+    
+    return codec.response({'success': True, 'result': {'job': job}})
 
-    
\ No newline at end of file
+def _admin_error(request, enabled: bool, feature: str) -> HttpResponse:
+    """Checks the admin token of a request to an admin endpoint
+
+    Args:
+        request (HttpRequest): 
+            HTTP request object.
+        enabled (bool): 
+            Whether the feature of the endpoint is enabled.
+        feature (str): 
+            Name of the feature, used in the error message.
+
+    Returns:
+        HttpResponse: 
+            The error response (404 if the endpoint is disabled, 401 if the token is not valid), or None if the request is authorized.
+    """
+    if not enabled or not settings.CLS_ADMIN_TOKEN:
+        return codec.response({'error': f'{feature} is not enabled.'}, status=404)
+    
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {settings.CLS_ADMIN_TOKEN}'):
+        return codec.response({'error': 'Invalid admin token.'}, status=401)
+    
+    return None
+
+def _training_request(data: dict) -> tuple[tuple[int, int, int], tuple[int, int, int], list[str]]:
+    """Validates the content of a training request
+
+    Args:
+        data (dict): 
+            The decoded JSON body.
+
+    Raises:
+        ValueError: 
+            If the body is not an object, a range is not a list of three integers or the models are not a list of names.
+
+    Returns:
+        tuple[tuple[int, int, int], tuple[int, int, int], list[str]]: 
+            The training range, the testing range and the candidate models (None for all of them).
+    """
+    if not isinstance(data, dict):
+        raise ValueError('The request body must be a JSON object.')
+    
+    ranges = []
+    for key, default in (('train_parameters', settings.CLS_TRAIN_PARAMETERS), ('test_parameters', settings.CLS_TEST_PARAMETERS)):
+        parameters = data.get(key, default)
+        if not isinstance(parameters, (list, tuple)) or len(parameters) != 3 or \
+           not all(isinstance(value, int) and not isinstance(value, bool) for value in parameters):
+            raise ValueError(f'{key} must be a list of three integers [start, end, step].')
+        ranges.append(tuple(parameters))
+    
+    models = data.get('models')
+    if models is not None and (not isinstance(models, list) or not all(isinstance(model_name, str) for model_name in models)):
+        raise ValueError('models must be a list of model names.')
+    
+    return ranges[0], ranges[1], models
+
+def _classifier_metrics() -> list:
+    """Collects the metrics of the prediction cache and of the early exit of the ensemble (see `MetricsRegistry.add_collector`)"""
+    global classifier
+    
+    families = []
+    
+    cache = classifier.cache_stats()
+    if cache:
+        families += [
+            ('cls_prediction_cache_hits_total', 'counter', 'Predictions found in the cache.', [({}, cache['hits'])]),
+            ('cls_prediction_cache_misses_total', 'counter', 'Predictions not found in the cache.', [({}, cache['misses'])]),
+            ('cls_prediction_cache_entries', 'gauge', 'Predictions stored in the cache.', [({}, cache['entries'])]),
+            ('cls_prediction_cache_bytes', 'gauge', 'Estimated memory used by the cache.', [({}, cache['bytes'])]),
+        ]
+    
+    ensemble = classifier.ensemble_stats()
+    families += [
+        ('cls_ensemble_predictions_total', 'counter', 'Ensemble predictions with early exit (since the models changed).', [({}, ensemble['predictions'])]),
+        ('cls_ensemble_early_exits_total', 'counter', 'Ensemble predictions that skipped models (since the models changed).', [({}, ensemble['early_exits'])]),
+        ('cls_ensemble_skipped_calls_total', 'counter', 'Model calls skipped by the early exit (since the models changed).', 
+            [({'model': model_name}, model_stats['skipped']) for model_name, model_stats in ensemble['models'].items()]),
+    ]
+    
+    return families
+
+REGISTRY.add_collector(_classifier_metrics)
+
+def metrics(request):
+    """
+    Web request to export the metrics of the process in the Prometheus text format
+
+    Args:
+        request (HttpRequest): 
+            HTTP request object.
+
+    Returns:
+        HttpResponse: 
+            Response with the metrics.
+    """
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
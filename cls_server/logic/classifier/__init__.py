@@ -1,2 +1,6 @@
 
-from .classifier import * 
\ No newline at end of file
+from .classifier import * 
+from .compiled import *
+from .lazy import *
+from .artifacts import *
+from .pool import *
@@ -0,0 +1,113 @@
+
+import hashlib
+import json
+import platform
+import shutil
+import tempfile
+from importlib.metadata import version
+from os import path, rename
+
+from .classifier import MANIFEST_NAME, MODEL_PARAMETERS, MyClassifier
+from ..dataset.numbers import load
+from ..tools import create_directory
+
+
+# Increase it when the way of building or storing the models changes, so old artifacts are not reused
+ARTIFACT_VERSION = 2
+
+
+def artifact_key(classifier: MyClassifier, train_parameters: tuple[int, int, int], test_parameters: tuple[int, int, int]) -> str:
+    """Computes the key that identifies the models built with the given configuration.
+
+    The key takes into account the dataset parameters, the candidate models, their hyperparameters and preprocessor, the training mode (`dedupe`), the model selection and the versions of the libraries used to train them.
+
+    Args:
+        classifier (MyClassifier):
+            The classifier whose candidate models (`generic_models`) will be built.
+        train_parameters (tuple[int, int, int]):
+            A tuple representing the training data range (start, end, step).
+        test_parameters (tuple[int, int, int]):
+            A tuple representing the testing data range (start, end, step).
+
+    Returns:
+        str:
+            Hexadecimal digest that identifies the configuration.
+
+    """
+    return hashlib.sha256(json.dumps(_artifact_description(classifier, train_parameters, test_parameters), sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def build_or_load_models(classifier: MyClassifier, train_parameters: tuple[int, int, int], test_parameters: tuple[int, int, int], cache_dir: str) -> bool:
+    """Loads the models of the classifier from the artifact cache, building and saving them if they are not cached.
+
+    The artifacts are stored in a subdirectory of `cache_dir` named after `artifact_key`. The subdirectory is written under a
+    temporary name and renamed when it is complete, so several processes can share the same cache.
+
+    Args:
+        classifier (MyClassifier):
+            The classifier whose models will be loaded or built.
+        train_parameters (tuple[int, int, int]):
+            A tuple representing the training data range (start, end, step).
+        test_parameters (tuple[int, int, int]):
+            A tuple representing the testing data range (start, end, step).
+        cache_dir (str):
+            The path of the directory that contains the cached artifacts.
+
+    Returns:
+        bool:
+            True if the models were loaded from the cache, False if they were built.
+
+    """
+    key = artifact_key(classifier, train_parameters, test_parameters)
+    dir_path = path.join(cache_dir, key)
+
+    if path.isfile(path.join(dir_path, MANIFEST_NAME)):
+        classifier.load_models(dir_path)
+        print(f'### MODELS LOADED FROM CACHE ({dir_path}) ###')
+        return True
+
+    classifier.build_models(load(train_parameters, test_parameters, classifier.preprocessor))
+
+    create_directory(cache_dir)
+    tmp_path = tempfile.mkdtemp(prefix=f'{key}.tmp-', dir=cache_dir)
+    try:
+        classifier.save_models(tmp_path, _artifact_description(classifier, train_parameters, test_parameters))
+        rename(tmp_path, dir_path)
+        print(f'### MODELS SAVED IN CACHE ({dir_path}) ###')
+    except OSError:
+        # Another process stored the same artifacts first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return False
+
+
+def _artifact_description(classifier: MyClassifier, train_parameters: tuple[int, int, int], test_parameters: tuple[int, int, int]) -> dict:
+    """Describes the configuration used to build the models of the classifier.
+
+    Args:
+        classifier (MyClassifier):
+            The classifier whose models will be built.
+        train_parameters (tuple[int, int, int]):
+            A tuple representing the training data range (start, end, step).
+        test_parameters (tuple[int, int, int]):
+            A tuple representing the testing data range (start, end, step).
+
+    Returns:
+        dict:
+            JSON serializable description of the configuration.
+
+    """
+    return {
+        'artifact_version': ARTIFACT_VERSION,
+        'train_parameters': list(train_parameters),
+        'test_parameters': list(test_parameters),
+        'models': [[model_name, MODEL_PARAMETERS[model_name]] for model_name in classifier.generic_models],
+        'dedupe': classifier.dedupe,
+        'preprocessor': classifier.preprocessor,
+        'selection': [classifier.selection, classifier.halving_factor, classifier.halving_min_folds, classifier.halving_tolerance],
+        'versions': {
+            'python': platform.python_version(),
+            'numpy': version('numpy'),
+            'scikit-learn': version('scikit-learn'),
+        },
+    }
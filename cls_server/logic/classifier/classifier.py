@@ -2,35 +2,118 @@
 
 import numpy as np
 
+import importlib
+import json
+import multiprocessing
+import os
 import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
 from os import path
 from os import listdir
 
-from sklearn.model_selection import KFold
+# scikit-learn (and joblib) are imported when they are needed, so importing this module (or only serving
+# the list of models) does not load them
 
-from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.naive_bayes import GaussianNB 
+from .compiled import LookupModel
+from ..dataset.preprocessors import DEFAULT_PREPROCESSOR, Preprocessor, get_preprocessor
+from .lazy import LazyModel
+from ..metrics import MODEL_PREDICT_SECONDS, PREPROCESS_SECONDS, TRAINING_FOLD_SECONDS, TRAINING_MODEL_SECONDS
+from ..tools import LRUCache, create_directory, decided_votes, halving_survivors, most_frequent, most_frequent_columns, unique_rows, unique_samples
 
-from sklearn.metrics import accuracy_score
-
-from ..tools import create_directory, most_frequent
-
-from typing import TypeVar
+from typing import TYPE_CHECKING, TypeVar
 T = TypeVar('T')
 R = TypeVar('R')
 
+if TYPE_CHECKING:
+    from sklearn.model_selection import KFold
+
+MANIFEST_NAME = 'manifest.json'
+MODEL_EXTENSION = '.joblib'
+# Extension of the models saved by previous versions (pickle files), which can still be loaded
+LEGACY_MODEL_EXTENSION = '.pkl'
+
 
 class MyClassifier: 
     
-    def __init__(self):
+    def __init__(self, n_jobs: int = 1, backend: str = 'process', cache_size: int = 0, cache_bytes: int = None, cache_key: str = 'features', early_exit: bool = False, dedupe: bool = False,
+                 selection: str = 'exhaustive', halving_factor: int = 3, halving_min_folds: int = 2, halving_tolerance: float = 0.0,
+                 preprocessor: str = DEFAULT_PREPROCESSOR):
+        """
+        Args:
+            n_jobs (int, optional): 
+                Number of workers used to evaluate the (model, fold) pairs of the K-fold cross-validation. 
+                With 1 they are evaluated sequentially, with -1 one worker per processor is used. Defaults to 1.
+            backend (str, optional): 
+                Kind of pool used when `n_jobs` is not 1: 'process' or 'thread'. Defaults to 'process'.
+            cache_size (int, optional): 
+                Maximum number of predictions kept in an LRU cache. With 0 there is no cache. Defaults to 0.
+            cache_bytes (int, optional): 
+                Maximum (estimated) bytes used by the cache. If None, it is only limited by `cache_size`. Defaults to None.
+            cache_key (str, optional): 
+                What identifies a prediction in the cache, together with the model name (or the ensemble): 
+                'features' (the preprocessed feature vector) or 'value' (the raw input value). Defaults to 'features'.
+            early_exit (bool, optional): 
+                If True, the ensemble calls the models from the fastest to the slowest (by measured latency) and stops when the 
+                remaining models cannot change the vote. The predictions are the same as calling all the models. Defaults to False.
+            dedupe (bool, optional): 
+                If True, the models are trained on the unique (features, label) rows of the training data, weighted by their number 
+                of occurrences, and evaluated on the unique rows of each fold. The models that do not support sample weights are 
+                trained on all the rows. Defaults to False.
+            selection (str, optional): 
+                How the candidate models are evaluated: 'exhaustive' (K-fold cross-validation of all of them) or 'halving' 
+                (successive halving, see `_select_models`). Defaults to 'exhaustive'.
+            halving_factor (int, optional): 
+                With the 'halving' selection, the fraction (1 / factor) of models kept after each round, and how many times more folds 
+                the next round evaluates. Defaults to 3.
+            halving_min_folds (int, optional): 
+                With the 'halving' selection, number of folds of the first round. Defaults to 2.
+            halving_tolerance (float, optional): 
+                With the 'halving' selection, the models whose accuracy is within this distance of the best one are never dropped. Defaults to 0.0.
+            preprocessor (str, optional): 
+                Name of the registered preprocessor (see `logic.dataset.preprocessors`) that transforms the values into the features 
+                of the models. It is saved with the models, and replaced by the one of the loaded models. Defaults to `DEFAULT_PREPROCESSOR`.
+
+        Raises:
+            ValueError: 
+                If the backend, the cache key, the selection or the preprocessor is not supported.
+        
+        """
+        if backend not in ('process', 'thread'):
+            raise ValueError(f"Unsupported backend: {backend}")
+        
+        if cache_key not in ('features', 'value'):
+            raise ValueError(f"Unsupported cache key: {cache_key}")
+        
+        if selection not in ('exhaustive', 'halving'):
+            raise ValueError(f"Unsupported selection: {selection}")
+        
+        if halving_factor < 2 or halving_min_folds < 1:
+            raise ValueError("The halving factor must be at least 2 and the first round must have at least one fold")
+        
+        get_preprocessor(preprocessor)
+        
         self.generic_models = ['logistic_regression', 'svc', 'decision_tree', 'random_forest', 'knn', 'naive_bayes']
-        self.models = dict()
+        # The models and the name of their preprocessor are replaced together (see `_set_models`)
+        self._snapshot = (dict(), preprocessor)
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.evaluation_times = dict()
+        self.cache = LRUCache(cache_size, cache_bytes) if cache_size > 0 else None
+        self.cache_key = cache_key
+        self.models_listeners = []
+        self.early_exit = early_exit
+        self.dedupe = dedupe
+        self.selection = selection
+        self.halving_factor = halving_factor
+        self.halving_min_folds = halving_min_folds
+        self.halving_tolerance = halving_tolerance
+        self._ensemble_lock = threading.Lock()
+        self._reset_ensemble_stats()
     
-    def build_models(self, dataset: tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]]):
+    def build_models(self, dataset: tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]], progress: callable = None):
         """Builds and evaluates different machine learning models using K-fold cross-validation.
         
         This function performs basic data validation and then delegates the actual model building and evaluation to the function.
@@ -38,6 +121,9 @@ class MyClassifier:
         Args:
             dataset (tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]]):
                 A tuple containing training data (X_train, y_train) and testing data (X_test, y_test).
+            progress (callable, optional): 
+                Function called as `progress(stage, done, total)` while the models are built: with the stage 'evaluation' after each 
+                evaluated (model, fold) pair (of the current round, with the 'halving' selection), and with 'training' after each trained model.
 
         Raise:
             ValueError: 
@@ -47,68 +133,246 @@ class MyClassifier:
         if len(dataset[0]) != len(dataset[1]) or len(dataset[2]) != len(dataset[3]):
             raise ValueError("Dataset lists must have equal dimensions.")
 
-        return self._build_models(dataset)
+        return self._build_models(dataset, progress)
     
-    def _build_models(self, dataset: tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]]) -> None:
+    def _build_models(self, dataset: tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]], progress: callable = None) -> None:
         """
         Builds and evaluates different machine learning models using K-fold cross-validation.
 
         Args:
             dataset (tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]]):
                 A tuple containing training data (X_train, y_train) and testing data (X_test, y_test).
+            progress (callable, optional): 
+                Function that receives the progress of the build (see `build_models`).
             
         """
-        relation = dict()
-        
         print('### BUILDING MODELS ###')
-        for model_name in self.generic_models:
-            relation[model_name] = self._evaluate_model(model_name, *dataset[:2])
+        evaluation_progress = partial(progress, 'evaluation') if progress is not None else None
+        if self.selection == 'halving':
+            relation = self._select_models(self.generic_models, *dataset[:2], evaluation_progress)
+        else:
+            relation = self._evaluate_models(self.generic_models, *dataset[:2], evaluation_progress)
             
         print('\n### TAKING THE BEST MODELS ###')
+        models = dict(self.models)
         max_value = max(relation.values())
-        for model_name, value in relation.items():
-            if value == max_value:
-                self._train_model(model_name, dataset)
+        best = [model_name for model_name, value in relation.items() if value == max_value]
+        for done, model_name in enumerate(best, 1):
+            models[model_name] = self._train_model(model_name, dataset)
+            if progress is not None:
+                progress('training', done, len(best))
+        
+        self._set_models(models)
+        
+    def _evaluate_models(self, model_names: list[str], X_train: np.ndarray[T], y_train: np.ndarray[R], progress: callable = None) -> dict[str, float]:
+        """
+        Evaluates the accuracy of several models using K-fold cross-validation.
+
+        If `n_jobs` is not 1, every (model, fold) pair is evaluated as an independent task in a pool of workers. 
+        The folds and the models are the same as in the sequential evaluation, so the results are identical.
+
+        Args:
+            model_names (list[str]): 
+                The names of the models to be evaluated.
+            X_train (np.ndarray[T]): 
+                Training data features.
+            y_train (np.ndarray[R]): 
+                Training data labels.
+                
+        Return:
+            dict[str, float]: 
+                The average accuracy of each model.
+
+        """
+        splits = list(_kfold(X_train).split(X_train))
+        results, wall_times = self._evaluate_folds(model_names, X_train, y_train, splits, range(len(splits)), progress)
         
-    def _evaluate_model(self, model_name: str, X_train: np.ndarray[T], y_train: np.ndarray[R]) -> float:
+        return {
+            model_name: self._record_evaluation(model_name, results[model_name], wall_times[model_name])
+            for model_name in model_names
+        }
+    
+    def _select_models(self, model_names: list[str], X_train: np.ndarray[T], y_train: np.ndarray[R], progress: callable = None) -> dict[str, float]:
         """
-        Evaluates the accuracy of the model using K-fold cross-validation.
+        Evaluates the accuracy of several models using successive halving over the K-fold splits.
+
+        All the models are evaluated on the first `halving_min_folds` folds. Then only the best `1 / halving_factor` of them 
+        (and any other within `halving_tolerance` of the best or tied with the last one kept) are evaluated on `halving_factor` 
+        times more folds, and so on until the kept models have been evaluated on all the folds or only one is left. 
+        The folds are the same as in `_evaluate_models`, so the models evaluated on all the folds get the same accuracies. 
+        A model that is left alone is selected without evaluating more folds, with the accuracy of the folds evaluated so far.
 
         Args:
-            model_name (str): 
-                The name of the model to be evaluated.
+            model_names (list[str]): 
+                The names of the models to be evaluated.
             X_train (np.ndarray[T]): 
                 Training data features.
             y_train (np.ndarray[R]): 
                 Training data labels.
                 
         Return:
-            float: 
-                The average accuracy of the model.
+            dict[str, float]: 
+                The average accuracy of each model that reached the last round.
 
         """
-        kfold = KFold(n_splits=min(10, len(X_train)), shuffle=True, random_state=42)
+        splits = list(_kfold(X_train).split(X_train))
+        results = {model_name: [] for model_name in model_names}
+        wall_times = {model_name: 0.0 for model_name in model_names}
+        
+        candidates = list(model_names)
+        n_folds = 0
+        while True:
+            next_folds = min(len(splits), max(n_folds * self.halving_factor, self.halving_min_folds))
+            round_results, round_times = self._evaluate_folds(candidates, X_train, y_train, splits, range(n_folds, next_folds), progress)
+            for model_name in candidates:
+                results[model_name] += round_results[model_name]
+                wall_times[model_name] += round_times[model_name]
+            n_folds = next_folds
             
-        accuracies = []
+            if n_folds == len(splits):
+                break
             
-        for train_index, test_index in kfold.split(X_train):
-            model = initialize_model(model_name)
+            scores = {model_name: np.mean([accuracy for accuracy, _ in results[model_name]]) for model_name in candidates}
+            candidates = halving_survivors(scores, self.halving_factor, self.halving_tolerance)
             
-            Xtrain = X_train[train_index]
-            ytrain = y_train[train_index]
-            Xtest = X_train[test_index]
-            ytest = y_train[test_index]
+            for model_name in scores:
+                if model_name not in candidates:
+                    print(f'  Dropped after {n_folds} folds. Model: {model_name}. Average accuracy: {scores[model_name]}')
+            
+            # A single model left is the selected one, more folds would not change the selection
+            if len(candidates) == 1:
+                break
+        
+        return {
+            model_name: self._record_evaluation(model_name, results[model_name], wall_times[model_name])
+            for model_name in candidates
+        }
+    
+    def _evaluate_folds(self, model_names: list[str], X_train: np.ndarray[T], y_train: np.ndarray[R], splits: list[tuple[np.ndarray[int], np.ndarray[int]]], folds: range, progress: callable = None) -> tuple[dict[str, list], dict[str, float]]:
+        """
+        Evaluates several models on some of the K-fold splits, in a pool of workers if `n_jobs` is not 1.
 
-            model.fit(Xtrain, ytrain)
+        Args:
+            model_names (list[str]): 
+                The names of the models to be evaluated.
+            X_train (np.ndarray[T]): 
+                Training data features.
+            y_train (np.ndarray[R]): 
+                Training data labels.
+            splits (list[tuple[np.ndarray[int], np.ndarray[int]]]): 
+                All the K-fold splits.
+            folds (range): 
+                The indexes of the splits to evaluate.
+            progress (callable, optional): 
+                Function called as `progress(done, total)` after each evaluated (model, fold) pair.
+                
+        Return:
+            tuple[dict[str, list], dict[str, float]]: 
+                The (accuracy, seconds) of each model in each evaluated fold, in fold order, and the seconds elapsed until all the folds of each model finished.
 
-            accuracies.append(accuracy_score(ytest, model.predict(Xtest)))
+        """
+        total = len(model_names) * len(folds)
+        n_jobs = _n_workers(self.n_jobs, total)
+        results = {model_name: [None] * len(folds) for model_name in model_names}
+        wall_times = dict()
+        
+        if progress is None:
+            progress = lambda done, total: None
+        
+        if n_jobs == 1:
+            done = 0
+            for model_name in model_names:
+                start = time.perf_counter()
+                for index, fold in enumerate(folds):
+                    results[model_name][index] = _evaluate_fold(model_name, X_train, y_train, splits[fold], dedupe=self.dedupe)
+                    done += 1
+                    progress(done, total)
+                wall_times[model_name] = time.perf_counter() - start
+            return results, wall_times
+        
+        pending = {model_name: len(folds) for model_name in model_names}
+        
+        start = time.perf_counter()
+        if self.backend == 'thread':
+            with ThreadPoolExecutor(n_jobs) as executor:
+                futures = {
+                    executor.submit(_evaluate_fold, model_name, X_train, y_train, splits[fold], True, self.dedupe): (model_name, index)
+                    for model_name in model_names for index, fold in enumerate(folds)
+                }
+                self._collect_folds(futures, results, pending, wall_times, start, progress)
+        else:
+            # Forking a process that already runs native thread pools (OpenMP, BLAS) can deadlock the children
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(n_jobs, mp_context=context, initializer=_init_fold_worker, initargs=(X_train, y_train, splits, self.dedupe)) as executor:
+                futures = {
+                    executor.submit(_evaluate_worker_fold, model_name, fold): (model_name, index)
+                    for model_name in model_names for index, fold in enumerate(folds)
+                }
+                self._collect_folds(futures, results, pending, wall_times, start, progress)
+        
+        return results, wall_times
+    
+    def _collect_folds(self, futures: dict, results: dict[str, list], pending: dict[str, int], wall_times: dict[str, float], start: float, progress: callable) -> None:
+        """
+        Waits for the fold evaluations and stores their results in order.
 
-        average = np.mean(accuracies)
-        print(f'  Using K-fold. Model: {model_name}. Average accuracy: {average}')
+        Args:
+            futures (dict): 
+                Relation between each submitted task and its (model name, position of the fold).
+            results (dict[str, list]): 
+                Results (accuracy, seconds) of each model, indexed by the position of the fold among the evaluated ones. It is filled by the function.
+            pending (dict[str, int]): 
+                Number of folds of each model that have not finished yet. It is updated by the function.
+            wall_times (dict[str, float]): 
+                Seconds elapsed since `start` until all the folds of each model finished. It is filled by the function.
+            start (float): 
+                Time (`time.perf_counter`) at which the tasks were submitted.
+            progress (callable): 
+                Function called as `progress(done, total)` after each finished task.
+            
+        """
+        for done, future in enumerate(as_completed(futures), 1):
+            model_name, fold = futures[future]
+            results[model_name][fold] = future.result()
+            
+            pending[model_name] -= 1
+            if pending[model_name] == 0:
+                wall_times[model_name] = time.perf_counter() - start
+            
+            progress(done, len(futures))
+    
+    def _record_evaluation(self, model_name: str, results: list[tuple[float, float]], wall_time: float) -> float:
+        """
+        Stores the times of the evaluation of a model and reports its average accuracy.
+
+        Args:
+            model_name (str): 
+                The name of the evaluated model.
+            results (list[tuple[float, float]]): 
+                Accuracy and seconds spent in each fold, in fold order.
+            wall_time (float): 
+                Seconds elapsed until the evaluation of all the folds finished.
+                
+        Return:
+            float: 
+                The average accuracy of the model.
+
+        """
+        average = np.mean([accuracy for accuracy, _ in results])
+        
+        self.evaluation_times[model_name] = {
+            'wall_time': wall_time,
+            'fold_times': [seconds for _, seconds in results],
+        }
+        print(f'  Using K-fold. Model: {model_name}. Average accuracy: {average}. Wall-clock time: {wall_time:.3f}s')
+        
+        TRAINING_MODEL_SECONDS.observe(wall_time, model=model_name)
+        for _, seconds in results:
+            TRAINING_FOLD_SECONDS.observe(seconds, model=model_name)
         
         return average
             
-    def _train_model(self, model_name: str, dataset: tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]]) -> None:
+    def _train_model(self, model_name: str, dataset: tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]]) -> callable:
         """Trains a model using the provided dataset.
 
         Args:
@@ -117,23 +381,111 @@ class MyClassifier:
             dataset (tuple[np.ndarray[T], np.ndarray[R], np.ndarray[T], np.ndarray[R]]): 
                 A tuple containing training data (X_train, y_train) and testing data (X_test, y_test).
 
+        Returns:
+            callable: 
+                The trained model.
+
         """
         X_train, y_train, X_test, y_test = dataset
         
         model = initialize_model(model_name)
-        model.fit(X_train, y_train)
+        _fit(model, X_train, y_train, self.dedupe)
         
+        from sklearn.metrics import accuracy_score
         print(f'  Using original test data. Model: {model_name}. Accuracy: {accuracy_score(y_test, model.predict(X_test))}')
         
-        self.models[model_name] = model
+        return model
+    
+    @property
+    def models(self) -> dict[str, callable]:
+        """The current models, by name."""
+        return self._snapshot[0]
+    
+    @property
+    def preprocessor(self) -> str:
+        """The name of the preprocessor of the current models."""
+        return self._snapshot[1]
+    
+    def _set_models(self, models: dict[str, callable], preprocessor: str = None) -> None:
+        """Replaces the models used to predict.
+
+        Every change of the models goes through this function, so the cached predictions are discarded and the models listeners are notified.
+        The models and their preprocessor are published as a single snapshot, which the predictions read once: a prediction that runs 
+        during a change uses the previous models with the previous preprocessor, or the new ones with the new one.
+
+        Args:
+            models (dict[str, callable]): 
+                The new models, by name.
+            preprocessor (str, optional): 
+                The name of the preprocessor of the new models. If None, the current one is kept.
+        
+        """
+        self._snapshot = (models, self.preprocessor if preprocessor is None else preprocessor)
+        
+        if self.cache is not None:
+            self.cache.clear()
+        
+        self._reset_ensemble_stats()
+        
+        for listener in self.models_listeners:
+            listener(self)
 
-    def save_models(self, dir_path: str) -> None:
+    def add_models_listener(self, listener: callable) -> None:
+        """Registers a function that is called every time the models change (they are built, loaded or compiled).
+
+        Args:
+            listener (callable): 
+                Function that receives the classifier, called after the models are replaced.
+        
+        """
+        self.models_listeners.append(listener)
+
+    def compile_models(self, max_features: int = 16) -> list[str]:
+        """Replaces the trained models by lookup tables over their (finite) feature space.
+
+        Each model is evaluated on every possible row of boolean features, and the predictions are stored in a `LookupModel`.
+        Boolean inputs are then answered from the table, with the same outputs as the model. Inputs of any other kind 
+        (a feature space that is not finite) are still predicted by the model itself.
+
+        Args:
+            max_features (int, optional): 
+                Models with more features are not compiled, since their table would have 2 ** n_features rows. Defaults to 16.
+
+        Returns:
+            list[str]: 
+                The names of the compiled models.
+        
+        """
+        models = dict(self.models)
+        compiled = []
+        
+        for model_name, model in models.items():
+            n_features = getattr(model, 'n_features_in_', None)
+            if isinstance(model, LookupModel) or n_features is None or n_features > max_features:
+                continue
+            
+            models[model_name] = LookupModel(model, n_features)
+            compiled.append(model_name)
+        
+        self._set_models(models)
+        
+        return compiled
+    
+    def save_models(self, dir_path: str, metadata: dict = None) -> None:
         """
         Saves the trained models to the specified directory
 
+        Compiled models are saved as the original estimators. Each model is saved with joblib, which stores its large arrays 
+        (support vectors, training data, ...) as raw data that `load_models` can memory-map. Besides one file per model, 
+        a manifest file is written with the names of the models (in order), the name of their preprocessor and the given metadata. 
+        The manifest is written last, so its presence (or its change) indicates that the directory is complete. Every file is written 
+        under a temporary name and then renamed, so the models that are already loaded (memory-mapped) from the directory are not modified.
+
         Args:
             dir_path (str): 
                 The path of the directory to save the models.
+            metadata (dict, optional): 
+                JSON serializable information to store in the manifest.
 
         Raises:
             OSError: 
@@ -142,62 +494,352 @@ class MyClassifier:
         """
         create_directory(dir_path)
         
+        import joblib
+        
         for model_name, model in self.models.items():
-            name = model_name + '.pkl'
-            with open(path.join(dir_path, name), 'wb') as f:
-                pickle.dump(model, f)
+            if isinstance(model, LookupModel):
+                model = model.estimator
+            if isinstance(model, LazyModel):
+                model = model.model
+            
+            file_path = path.join(dir_path, model_name + MODEL_EXTENSION)
+            joblib.dump(model, file_path + '.tmp')
+            os.replace(file_path + '.tmp', file_path)
+        
+        manifest = {
+            'models': list(self.models.keys()),
+            'storage': 'joblib',
+            'preprocessor': self.preprocessor,
+            'metadata': metadata or {},
+        }
+        manifest_path = path.join(dir_path, MANIFEST_NAME)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(manifest_path + '.tmp', manifest_path)
     
-    def load_models(self, dir_path: str) -> None:
+    def load_models(self, dir_path: str, mmap_mode: str = 'r', lazy: bool = True, replace: bool = False) -> None:
         """
         Loads trained models from the specified directory
 
+        If the directory has a manifest, the models are loaded in the order in which they were saved. 
+        The large arrays of the models are memory-mapped, so the processes that load the same directory share a single copy 
+        of them (the page cache) and the loading time does not grow with their size. Models saved as pickle files (`.pkl`) are also loaded.
+        The new models are swapped in at once when all of them are loaded: the predictions in progress finish with the previous models.
+        The preprocessor of the classifier becomes the one saved with the models (`DEFAULT_PREPROCESSOR` if the manifest does not have one).
+
         Args:
             dir_path (str): 
                 The path of the directory containing the saved models.
+            mmap_mode (str, optional): 
+                Mode used to memory-map the arrays of the models (see `numpy.load`). If None, the arrays are read into memory. Defaults to 'r'.
+            lazy (bool, optional): 
+                If True, each model is read the first time it is used (see `LazyModel`). Defaults to True.
+            replace (bool, optional): 
+                If True, the loaded models replace all the current ones. Otherwise, they are added to them (replacing the ones with the same name). Defaults to False.
 
         Raises:
             OSError: 
                 If an error occurs while loading the models.
             FileNotFoundError: 
                 If a model file is not found for a given model name.
+            ValueError: 
+                If the preprocessor of the models is not registered, or it is not the one of the current models that are kept (`replace` is False).
             
         """
-        for filename in listdir(dir_path):
-            if filename.endswith('.pkl'):
-                model_name, _ = path.splitext(filename)
-                with open(path.join(dir_path, filename), 'rb') as f:
-                    model = pickle.load(f)
-                    self.models[model_name] = model
+        manifest_path = path.join(dir_path, MANIFEST_NAME)
+        preprocessor = DEFAULT_PREPROCESSOR
+        if path.isfile(manifest_path):
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            extension = MODEL_EXTENSION if manifest.get('storage') == 'joblib' else LEGACY_MODEL_EXTENSION
+            filenames = [model_name + extension for model_name in manifest['models']]
+            preprocessor = manifest.get('preprocessor', DEFAULT_PREPROCESSOR)
+        else:
+            filenames = [filename for filename in listdir(dir_path) if filename.endswith((MODEL_EXTENSION, LEGACY_MODEL_EXTENSION))]
+        
+        get_preprocessor(preprocessor)
+        if not replace and self.models and preprocessor != self.preprocessor:
+            raise ValueError(f'The models of {dir_path} use the preprocessor {preprocessor}, not {self.preprocessor}')
         
-    def predict(self, value: T, preprocess: callable, model_name: str = None) -> R:
+        models = dict() if replace else dict(self.models)
+        for filename in filenames:
+            model_name, _ = path.splitext(filename)
+            file_path = path.join(dir_path, filename)
+            if lazy:
+                if not path.isfile(file_path):
+                    raise FileNotFoundError(f'Model file not found: {file_path}')
+                models[model_name] = LazyModel(partial(_load_model, file_path, mmap_mode))
+            else:
+                models[model_name] = _load_model(file_path, mmap_mode)
+        
+        self._set_models(models, preprocessor)
+        
+    def predict(self, value: T, preprocess: callable = None, model_name: str = None) -> R:
         """Predicts the output for a given value using a model or ensemble of models.
 
+        If the classifier has a cache, the prediction is looked up there first.
+
         Args:
             value (T): 
                 The input value for prediction.
-            preprocess (callable): 
-                A function that preprocesses the input value.
+            preprocess (callable, optional): 
+                A function that transforms the input value into a feature matrix of one row, or a registered preprocessor (or its name), 
+                whose scalar implementation is used. If None, the preprocessor of the models is used. Defaults to None.
             model_name (str, optional): 
                 The name of the specific model to use for prediction. If None, the most frequent prediction from all models is returned.
                 
         Raises:
             ValueError: 
-                If an unknown model name is provided.
+                If an unknown model name is provided, or the preprocessor is not the one of the models.
 
         Returns:
             R: 
                 The predicted output value.
     
         """
-        value = preprocess(value)
+        models, preprocessor = self._snapshot
+        
+        if model_name is not None and model_name not in models.keys():
+            raise ValueError('Unknown model name')
+        
+        preprocess = self._preprocessor(preprocess, preprocessor)
+        if isinstance(preprocess, Preprocessor):
+            preprocess = preprocess.one
         
-        if model_name is None:
-            return most_frequent([model.predict(value)[0] for model in self.models.values()])
+        if self.cache is None:
+            return self._predict_value(_preprocess(preprocess, value), model_name, models)
+        
+        features = None
+        if self.cache_key == 'value':
+            key = (model_name, value)
         else:
-            if model_name in self.models.keys():
-                return self.models[model_name].predict(value)[0]
+            features = _preprocess(preprocess, value)
+            key = (model_name, tuple(np.asarray(features).ravel().tolist()))
+        
+        result = self.cache.get(key, _MISSING)
+        if result is _MISSING:
+            result = self._predict_value(_preprocess(preprocess, value) if features is None else features, model_name, models)
+            self._cache_put(key, result, models)
+        
+        return result
+    
+    def predict_batch(self, values: list[T], preprocess: callable = None, model_name: str = None) -> np.ndarray[R]:
+        """Predicts the output for a batch of values using a model or ensemble of models.
+
+        The whole batch is transformed into a single feature matrix, and each model is called only once, with the distinct feature vectors 
+        of the batch. So the work of the models depends on the number of distinct vectors, not on the number of values.
+        If the classifier has a cache, the distinct values (or feature vectors) of the batch are looked up there first, and only the missing ones are predicted.
+
+        Args:
+            values (list[T]): 
+                The input values for prediction.
+            preprocess (callable, optional): 
+                A function that transforms the list of input values into a feature matrix (one row per value), or a registered 
+                preprocessor (or its name), whose batched implementation is used. If None, the preprocessor of the models is used. Defaults to None.
+            model_name (str, optional): 
+                The name of the specific model to use for prediction. If None, the most frequent prediction from all models is returned for each value.
+                
+        Raises:
+            ValueError: 
+                If an unknown model name is provided, or the preprocessor is not the one of the models.
+
+        Returns:
+            np.ndarray[R]: 
+                The predicted output values, in the same order as `values`.
+    
+        """
+        models, preprocessor = self._snapshot
+        
+        if model_name is not None and model_name not in models.keys():
+            raise ValueError('Unknown model name')
+        
+        if len(values) == 0:
+            return np.array([])
+        
+        preprocess = self._preprocessor(preprocess, preprocessor)
+        
+        if self.cache is None:
+            unique, inverse = unique_rows(_preprocess(preprocess, values))
+            return self._predict_rows(unique, model_name, models)[inverse]
+        
+        if self.cache_key == 'value':
+            unique_values, inverse = np.unique(np.asarray(values), return_inverse=True)
+            keys = unique_values.tolist()
+        else:
+            unique, inverse = unique_rows(_preprocess(preprocess, values))
+            keys = [tuple(row) for row in unique.tolist()]
+        
+        results = [self.cache.get((model_name, key), _MISSING) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is _MISSING]
+        
+        if missing:
+            if self.cache_key == 'value':
+                X = np.asarray(_preprocess(preprocess, unique_values[missing]))
             else:
-                raise ValueError('Unknown model name')
+                X = unique[missing]
+            
+            for i, result in zip(missing, self._predict_rows(X, model_name, models).tolist()):
+                results[i] = result
+                self._cache_put((model_name, keys[i]), result, models)
+        
+        return np.array(results)[inverse.reshape(-1)]
+    
+    def _preprocessor(self, preprocess: callable, preprocessor: str) -> callable:
+        """Gets the function that transforms the values into the features of the models.
+
+        Args:
+            preprocess (callable): 
+                None (the preprocessor of the models), a registered preprocessor or its name, or any other function (which is not checked).
+            preprocessor (str): 
+                The name of the preprocessor of the models (of the snapshot used by the prediction).
+
+        Raises:
+            ValueError: 
+                If the preprocessor is not registered, or it is not the one of the models.
+
+        Returns:
+            callable: 
+                The preprocessor or the function.
+        
+        """
+        if preprocess is None:
+            return get_preprocessor(preprocessor)
+        
+        if isinstance(preprocess, str):
+            preprocess = get_preprocessor(preprocess)
+        
+        if isinstance(preprocess, Preprocessor) and preprocess.name != preprocessor:
+            raise ValueError(f'The models use the preprocessor {preprocessor}, not {preprocess.name}')
+        
+        return preprocess
+    
+    def _predict_value(self, features: np.ndarray[T], model_name: str, models: dict[str, callable]) -> R:
+        """Predicts the output for the feature matrix of a single value (see `_predict_features`), with early exit if it is enabled."""
+        if model_name is None and self.early_exit:
+            return self._predict_ensemble(np.asarray(features), models)[0]
+        return _predict_features(features, model_name, models)
+    
+    def _predict_rows(self, X: np.ndarray[T], model_name: str, models: dict[str, callable]) -> np.ndarray[R]:
+        """Predicts the output for each row of a feature matrix (see `_predict_matrix`), with early exit if it is enabled."""
+        if model_name is None and self.early_exit:
+            return self._predict_ensemble(X, models)
+        return _predict_matrix(X, model_name, models)
+    
+    def _predict_ensemble(self, X: np.ndarray[T], models: dict[str, callable]) -> np.ndarray[R]:
+        """Predicts the most frequent output of the models for each row, stopping when the vote of every row is decided.
+
+        The models are called from the lowest to the highest latency per value (the ones that have not been measured yet go first). 
+        If the vote is not decided before the last 
+        model, the predictions are combined in the order of `models`, so the ties are resolved as without early exit.
+
+        Args:
+            X (np.ndarray[T]): 
+                The feature matrix.
+            models (dict[str, callable]): 
+                The models of the ensemble, by name.
+
+        Returns:
+            np.ndarray[R]: 
+                The predicted output values.
+        
+        """
+        stats = self.ensemble_stats_data
+        order = sorted(models, key=lambda model_name: stats['models'].get(model_name, {}).get('latency', 0.0))
+        
+        predictions = dict()
+        for i, model_name in enumerate(order):
+            start = time.perf_counter()
+            predictions[model_name] = models[model_name].predict(X)
+            elapsed = time.perf_counter() - start
+            MODEL_PREDICT_SECONDS.observe(elapsed, model=model_name)
+            self._record_latency(stats, model_name, elapsed / max(1, len(X)))
+            
+            remaining = len(order) - i - 1
+            if remaining:
+                winners = decided_votes(np.stack(list(predictions.values())), remaining)
+                if winners is not None:
+                    with self._ensemble_lock:
+                        stats['predictions'] += 1
+                        stats['early_exits'] += 1
+                        for skipped_name in order[i + 1:]:
+                            model_stats = stats['models'].setdefault(skipped_name, {'latency': 0.0, 'calls': 0, 'skipped': 0})
+                            model_stats['skipped'] += 1
+                    return winners
+        
+        with self._ensemble_lock:
+            stats['predictions'] += 1
+        
+        return most_frequent_columns(np.stack([predictions[model_name] for model_name in models]))
+    
+    def _record_latency(self, stats: dict, model_name: str, latency: float) -> None:
+        """Updates the latency per value of a model (exponential moving average).
+
+        Args:
+            stats (dict): 
+                The ensemble statistics of the models that made the prediction.
+            model_name (str): 
+                The name of the model.
+            latency (float): 
+                Seconds per value of the last call.
+        
+        """
+        with self._ensemble_lock:
+            model_stats = stats['models'].setdefault(model_name, {'latency': 0.0, 'calls': 0, 'skipped': 0})
+            model_stats['latency'] = latency if model_stats['calls'] == 0 else 0.8 * model_stats['latency'] + 0.2 * latency
+            model_stats['calls'] += 1
+    
+    def _reset_ensemble_stats(self) -> None:
+        """Discards the ensemble statistics (the models changed)."""
+        self.ensemble_stats_data = {'predictions': 0, 'early_exits': 0, 'models': dict()}
+    
+    def ensemble_stats(self) -> dict:
+        """Returns the statistics of the early exit of the ensemble
+        
+        Return:
+            dict: Dictionary with the number of ensemble predictions ('predictions'), how many of them stopped early ('early_exits'), 
+                and, for each model ('models'), its latency per value in seconds ('latency'), and the number of calls ('calls') and of skipped calls ('skipped').
+        
+        """
+        with self._ensemble_lock:
+            stats = self.ensemble_stats_data
+            return {
+                'predictions': stats['predictions'],
+                'early_exits': stats['early_exits'],
+                'models': {model_name: dict(model_stats) for model_name, model_stats in stats['models'].items()},
+            }
+    
+    def _cache_put(self, key: tuple, result: R, models: dict[str, callable]) -> None:
+        """Stores a prediction in the cache, unless the models changed while it was computed.
+
+        Args:
+            key (tuple): 
+                The key of the prediction: (model name, value or feature vector).
+            result (R): 
+                The predicted output value.
+            models (dict[str, callable]): 
+                The models used to compute the prediction.
+        
+        """
+        if models is self.models:
+            self.cache.put(key, result)
+    
+    def cache_stats(self) -> dict:
+        """Returns the usage statistics of the prediction cache
+        
+        Return:
+            dict: Dictionary with the keys 'hits', 'misses', 'entries' and 'bytes'. It is empty if the classifier has no cache.
+        
+        """
+        return self.cache.stats() if self.cache is not None else dict()
+    
+    def classes(self) -> list[R]:
+        """Returns the outputs that the models can predict
+        
+        Return:
+            list[R]: Sorted list with the classes of all the models.
+        
+        """
+        return sorted(set().union(*(model.classes_.tolist() for model in self.models.values())))
     
     def models_name(self) -> list[str]:
         """Returns the models used by the class to predict
@@ -209,42 +851,316 @@ class MyClassifier:
         return list(self.models.keys())
     
 
-def initialize_model(model_name: str) -> callable:
-    """Initializes a machine learning model based on the provided name.
+# Marks the lookups that are not in the cache (None could be a valid prediction)
+_MISSING = object()
+
+
+def _predict_features(features: np.ndarray[T], model_name: str, models: dict[str, callable]) -> R:
+    """Predicts the output for the feature matrix of a single value.
 
     Args:
+        features (np.ndarray[T]): 
+            Feature matrix with one row.
         model_name (str): 
-            The name of the model to be initialized.
+            The name of the specific model to use for prediction. If None, the most frequent prediction from all models is returned.
+        models (dict[str, callable]): 
+            The available models, by name.
 
-    Raises:
-        ValueError: 
-            If the provided model name is not supported.
+    Returns:
+        R: 
+            The predicted output value.
+        
+    """
+    if model_name is None:
+        return most_frequent([_timed_predict(name, model, features)[0] for name, model in models.items()])
+    else:
+        return _timed_predict(model_name, models[model_name], features)[0]
+
+
+def _predict_matrix(X: np.ndarray[T], model_name: str, models: dict[str, callable]) -> np.ndarray[R]:
+    """Predicts the output for each row of a feature matrix.
+
+    Args:
+        X (np.ndarray[T]): 
+            The feature matrix.
+        model_name (str): 
+            The name of the specific model to use for prediction. If None, the most frequent prediction from all models is returned for each row.
+        models (dict[str, callable]): 
+            The available models, by name.
+
+    Returns:
+        np.ndarray[R]: 
+            The predicted output values.
+        
+    """
+    if model_name is None:
+        return most_frequent_columns(np.stack([_timed_predict(name, model, X) for name, model in models.items()]))
+    else:
+        return _timed_predict(model_name, models[model_name], X)
+
+
+def _timed_predict(model_name: str, model: callable, X: np.ndarray[T]) -> np.ndarray[R]:
+    """Predicts with a model, recording the time of the call (`MODEL_PREDICT_SECONDS`).
+
+    Args:
+        model_name (str): 
+            The name of the model.
+        model (callable): 
+            The model.
+        X (np.ndarray[T]): 
+            The feature matrix.
+
+    Returns:
+        np.ndarray[R]: 
+            The predicted output values.
+        
+    """
+    start = time.perf_counter()
+    result = model.predict(X)
+    MODEL_PREDICT_SECONDS.observe(time.perf_counter() - start, model=model_name)
+    return result
+
+
+def _preprocess(preprocess: callable, values: T) -> np.ndarray[T]:
+    """Transforms input values into features, recording the time spent (`PREPROCESS_SECONDS`).
+
+    Args:
+        preprocess (callable): 
+            The function that transforms the values.
+        values (T): 
+            The input value or values.
+
+    Returns:
+        np.ndarray[T]: 
+            The features.
+        
+    """
+    start = time.perf_counter()
+    features = preprocess(values)
+    PREPROCESS_SECONDS.observe(time.perf_counter() - start)
+    return features
+
+
+def _load_model(file_path: str, mmap_mode: str = 'r') -> callable:
+    """Reads a model saved by `MyClassifier.save_models`.
+
+    Args:
+        file_path (str): 
+            The path of the model file: a joblib file (`MODEL_EXTENSION`) or a pickle file (`LEGACY_MODEL_EXTENSION`).
+        mmap_mode (str, optional): 
+            Mode used to memory-map the arrays of joblib files. Defaults to 'r'.
 
     Returns:
         callable: 
-            A newly initialized model object.
+            The model.
         
-    """    
-    if model_name == 'logistic_regression':
-        return LogisticRegression(random_state=42, n_jobs=4) 
+    """
+    if file_path.endswith(MODEL_EXTENSION):
+        import joblib
+        return joblib.load(file_path, mmap_mode=mmap_mode)
     
-    elif model_name == 'svc':
-        return SVC()
+    with open(file_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _kfold(X_train: np.ndarray[T]) -> 'KFold':
+    """Creates the K-fold cross-validator used to evaluate the models.
+
+    Args:
+        X_train (np.ndarray[T]): 
+            Training data features.
+
+    Returns:
+        KFold: 
+            The cross-validator.
+        
+    """
+    from sklearn.model_selection import KFold
+    return KFold(n_splits=min(10, len(X_train)), shuffle=True, random_state=42)
+
 
-    elif model_name == 'decision_tree':
-        return DecisionTreeClassifier(random_state=42) 
+def _n_workers(n_jobs: int, n_tasks: int) -> int:
+    """Computes the number of workers to use for a number of tasks.
 
-    elif model_name == 'random_forest':
-        return RandomForestClassifier(random_state=42) 
+    Args:
+        n_jobs (int): 
+            Requested number of workers. If it is negative, `os.cpu_count() + 1 + n_jobs` workers are used (-1 means all the processors).
+        n_tasks (int): 
+            Number of tasks to run.
+
+    Returns:
+        int: 
+            The number of workers, between 1 and `n_tasks`.
+        
+    """
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    
+    return max(1, min(n_jobs, n_tasks))
 
-    elif model_name == 'knn':
-        return KNeighborsClassifier(n_neighbors=1, n_jobs=4) 
 
-    elif model_name == 'naive_bayes':
-        return GaussianNB()
+def _evaluate_fold(model_name: str, X_train: np.ndarray[T], y_train: np.ndarray[R], split: tuple[np.ndarray[int], np.ndarray[int]], single_job: bool = False, dedupe: bool = False) -> tuple[float, float]:
+    """Trains a new model on a K-fold split and evaluates its accuracy.
 
+    Args:
+        model_name (str): 
+            The name of the model to be evaluated.
+        X_train (np.ndarray[T]): 
+            Training data features.
+        y_train (np.ndarray[R]): 
+            Training data labels.
+        split (tuple[np.ndarray[int], np.ndarray[int]]): 
+            Indexes of the rows used to train and to test.
+        single_job (bool, optional): 
+            If True, the model does not start its own parallel jobs (`n_jobs=1`). It is used when the folds already run in a pool, and does not change the results. Defaults to False.
+        dedupe (bool, optional): 
+            If True, the model is trained and tested on the unique rows of the split, weighted by their number of occurrences (see `_fit`). 
+            The accuracy is the same as testing every row. Defaults to False.
+
+    Returns:
+        tuple[float, float]: 
+            The accuracy of the model and the seconds spent.
+        
+    """
+    start = time.perf_counter()
+    train_index, test_index = split
+    
+    model = initialize_model(model_name)
+    if single_job and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)
+    
+    Xtrain = X_train[train_index]
+    ytrain = y_train[train_index]
+    Xtest = X_train[test_index]
+    ytest = y_train[test_index]
+
+    _fit(model, Xtrain, ytrain, dedupe)
+
+    from sklearn.metrics import accuracy_score
+    if dedupe:
+        Xtest, ytest, counts = unique_samples(Xtest, ytest)
+        accuracy = accuracy_score(ytest, model.predict(Xtest), sample_weight=counts)
     else:
-        raise ValueError(f"Unsupported model name: {model_name}")
+        accuracy = accuracy_score(ytest, model.predict(Xtest))
+    
+    return accuracy, time.perf_counter() - start
+
+
+def _fit(model: callable, X_train: np.ndarray[T], y_train: np.ndarray[R], dedupe: bool = False) -> callable:
+    """Trains a model.
+
+    With `dedupe`, the repeated (features, label) rows are collapsed into unique rows whose number of occurrences is passed as `sample_weight`,
+    so the training time and the size of the model do not grow with the repetitions. It is the same objective as training on all the rows
+    (the random forests draw their bootstrap samples from the unique rows, though). The models that do not support sample weights (KNN)
+    are trained on all the rows.
+
+    Args:
+        model (callable): 
+            The model to train.
+        X_train (np.ndarray[T]): 
+            Training data features.
+        y_train (np.ndarray[R]): 
+            Training data labels.
+        dedupe (bool, optional): 
+            Whether the model is trained on the unique rows. Defaults to False.
+
+    Returns:
+        callable: 
+            The trained model.
+        
+    """
+    if dedupe:
+        from sklearn.utils.validation import has_fit_parameter
+        if has_fit_parameter(model, 'sample_weight'):
+            X_unique, y_unique, counts = unique_samples(X_train, y_train)
+            return model.fit(X_unique, y_unique, sample_weight=counts)
+    
+    return model.fit(X_train, y_train)
+
+
+# Training data of the worker processes of the K-fold evaluation, so it is sent once per process instead of once per task
+_worker_data = None
+
+
+def _init_fold_worker(X_train: np.ndarray[T], y_train: np.ndarray[R], splits: list[tuple[np.ndarray[int], np.ndarray[int]]], dedupe: bool = False) -> None:
+    """Stores the training data in a worker process of the K-fold evaluation.
+
+    Args:
+        X_train (np.ndarray[T]): 
+            Training data features.
+        y_train (np.ndarray[R]): 
+            Training data labels.
+        splits (list[tuple[np.ndarray[int], np.ndarray[int]]]): 
+            The K-fold splits.
+        dedupe (bool, optional): 
+            Whether the models are trained on the unique rows (see `_evaluate_fold`). Defaults to False.
+        
+    """
+    global _worker_data
+    _worker_data = (X_train, y_train, splits, dedupe)
+
+
+def _evaluate_worker_fold(model_name: str, fold: int) -> tuple[float, float]:
+    """Evaluates a model on a K-fold split in a worker process (see `_init_fold_worker`).
+
+    Args:
+        model_name (str): 
+            The name of the model to be evaluated.
+        fold (int): 
+            The index of the split.
+
+    Returns:
+        tuple[float, float]: 
+            The accuracy of the model and the seconds spent.
+        
+    """
+    X_train, y_train, splits, dedupe = _worker_data
+    return _evaluate_fold(model_name, X_train, y_train, splits[fold], True, dedupe)
+
+
+# Hyperparameters used to initialize each supported model
+MODEL_PARAMETERS = {
+    'logistic_regression': {'random_state': 42, 'n_jobs': 4},
+    'svc': {},
+    'decision_tree': {'random_state': 42},
+    'random_forest': {'random_state': 42},
+    'knn': {'n_neighbors': 1, 'n_jobs': 4},
+    'naive_bayes': {},
+}
+
+# Module and class of each supported model, imported when a model is initialized
+_MODEL_CLASSES = {
+    'logistic_regression': ('sklearn.linear_model', 'LogisticRegression'),
+    'svc': ('sklearn.svm', 'SVC'),
+    'decision_tree': ('sklearn.tree', 'DecisionTreeClassifier'),
+    'random_forest': ('sklearn.ensemble', 'RandomForestClassifier'),
+    'knn': ('sklearn.neighbors', 'KNeighborsClassifier'),
+    'naive_bayes': ('sklearn.naive_bayes', 'GaussianNB'),
+}
 
 
- 
\ No newline at end of file
+def initialize_model(model_name: str) -> callable:
+    """Initializes a machine learning model based on the provided name.
+
+    The module of the model is imported the first time it is needed.
+
+    Args:
+        model_name (str): 
+            The name of the model to be initialized.
+
+    Raises:
+        ValueError: 
+            If the provided model name is not supported.
+
+    Returns:
+        callable: 
+            A newly initialized model object, configured with the hyperparameters of `MODEL_PARAMETERS`.
+        
+    """    
+    if model_name not in _MODEL_CLASSES:
+        raise ValueError(f"Unsupported model name: {model_name}")
+    
+    module_name, class_name = _MODEL_CLASSES[model_name]
+    model_class = getattr(importlib.import_module(module_name), class_name)
+    
+    return model_class(**MODEL_PARAMETERS[model_name])
@@ -0,0 +1,73 @@
+
+
+import numpy as np
+
+from typing import TypeVar
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class LookupModel:
+    """Model that answers from a precomputed table of the predictions of an estimator.
+
+    The table covers every possible input of a finite feature space: rows of `n_features` booleans (2 ** `n_features` inputs).
+    Any other input (other dtype or number of features) is predicted by the original estimator, so the outputs are always
+    the same as the estimator ones.
+
+    """
+
+    def __init__(self, estimator: callable, n_features: int):
+        """
+        Args:
+            estimator (callable):
+                Trained model that works with `n_features` features.
+            n_features (int):
+                Number of features of the inputs.
+
+        """
+        self.estimator = estimator
+        self.n_features = n_features
+        self.weights = 1 << np.arange(n_features)
+        self.table = estimator.predict(feature_space(n_features))
+
+    def predict(self, X: np.ndarray[T]) -> np.ndarray[R]:
+        """Predicts the output of each row of a feature matrix.
+
+        Args:
+            X (np.ndarray[T]):
+                The feature matrix.
+
+        Returns:
+            np.ndarray[R]:
+                The predicted output values.
+
+        """
+        X = np.asarray(X)
+
+        if X.dtype != bool or X.ndim != 2 or X.shape[1] != self.n_features:
+            return self.estimator.predict(X)
+
+        return self.table[X @ self.weights]
+
+    def __getattr__(self, name: str):
+        # Any other attribute (`classes_`, `n_features_in_`, ...) is the estimator one
+        if name == 'estimator':
+            raise AttributeError(name)
+        return getattr(self.estimator, name)
+
+
+def feature_space(n_features: int) -> np.ndarray[bool]:
+    """Enumerates every row of `n_features` booleans.
+
+    The row `i` is the binary representation of `i`, with the first feature as the least significant bit.
+
+    Args:
+        n_features (int):
+            Number of features.
+
+    Returns:
+        np.ndarray[bool]:
+            Matrix of shape (2 ** n_features, n_features).
+
+    """
+    return (np.arange(2 ** n_features)[:, np.newaxis] >> np.arange(n_features) & 1).astype(bool)
@@ -0,0 +1,61 @@
+
+
+import threading
+
+import numpy as np
+
+from typing import TypeVar
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class LazyModel:
+    """Model that is loaded the first time it is used.
+
+    Any use of the model (`predict` or any of its attributes) loads it once, so the models that are never used are never read.
+
+    """
+
+    def __init__(self, load: callable):
+        """
+        Args:
+            load (callable):
+                Function without arguments that returns the model.
+
+        """
+        self.load = load
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> callable:
+        """The model, which is loaded the first time it is requested."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self.load()
+        return self._model
+
+    def is_loaded(self) -> bool:
+        """Whether the model has been loaded."""
+        return self._model is not None
+
+    def predict(self, X: np.ndarray[T]) -> np.ndarray[R]:
+        """Predicts the output of each row of a feature matrix.
+
+        Args:
+            X (np.ndarray[T]):
+                The feature matrix.
+
+        Returns:
+            np.ndarray[R]:
+                The predicted output values.
+
+        """
+        return self.model.predict(X)
+
+    def __getattr__(self, name: str):
+        # Any other attribute (`classes_`, `n_features_in_`, ...) is the model one
+        if name in ('load', '_model', '_lock'):
+            raise AttributeError(name)
+        return getattr(self.model, name)
@@ -0,0 +1,255 @@
+
+
+import multiprocessing
+import os
+import threading
+from multiprocessing.connection import wait as wait_objects
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .classifier import MyClassifier
+
+from typing import TypeVar
+R = TypeVar('R')
+
+
+class InferencePool:
+    """Pool of worker processes that predict with the models saved in a directory.
+
+    Each worker loads the models of the directory (memory-mapped, so the workers share one copy of their arrays) and predicts
+    chunks of the batches in parallel, without the limits of the GIL. The values of a batch and the predicted labels are exchanged
+    through a shared memory block, so only its name is sent to the workers.
+
+    """
+
+    def __init__(self, dir_path: str, preprocess: callable = None, n_workers: int = 2, max_pending: int = 16,
+                 timeout: float = 30.0, min_chunk: int = 10000, compile_models: bool = False):
+        """
+        Args:
+            dir_path (str):
+                The path of the directory with the models (see `MyClassifier.save_models`).
+            preprocess (callable, optional):
+                Function (that can be pickled) that transforms an array of values into a feature matrix, or a registered preprocessor.
+                If None, the workers use the preprocessor saved with the models. Defaults to None.
+            n_workers (int, optional):
+                Number of worker processes. Defaults to 2.
+            max_pending (int, optional):
+                Maximum number of batches in the pool. Further batches wait for a free place up to `timeout`. Defaults to 16.
+            timeout (float, optional):
+                Seconds that a batch can wait for a place in the pool and for its prediction. Defaults to 30.0.
+            min_chunk (int, optional):
+                Minimum number of values predicted by a worker. Larger batches are split among the workers. Defaults to 10000.
+            compile_models (bool, optional):
+                Whether the workers compile their models (see `MyClassifier.compile_models`). Defaults to False.
+
+        """
+        self.dir_path = dir_path
+        self.preprocess = preprocess
+        self.n_workers = n_workers
+        self.timeout = timeout
+        self.min_chunk = min_chunk
+        self.compile_models = compile_models
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_pool_worker,
+            initargs=(self.dir_path, self.preprocess, self.compile_models),
+        )
+
+    def restart(self) -> None:
+        """Replaces the workers by new ones, which load the current models of the directory.
+
+        The batches in progress finish in the previous workers.
+
+        """
+        executor, self._executor = self._executor, self._create_executor()
+        executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        """Stops the workers, after the batches in progress."""
+        self._executor.shutdown(wait=True)
+
+    def warm_up(self) -> None:
+        """Starts the workers and waits until they have loaded the models."""
+        futures = [self._executor.submit(_worker_ready) for _ in range(self.n_workers)]
+        for future in futures:
+            future.result(timeout=self.timeout)
+
+    def predict_batch(self, values: np.ndarray[np.int64], model_name: str = None) -> np.ndarray[R]:
+        """Predicts a batch of values in the worker processes.
+
+        Args:
+            values (np.ndarray[np.int64]):
+                The input values for prediction.
+            model_name (str, optional):
+                The name of the specific model to use for prediction. If None, the ensemble of all models is used.
+
+        Raises:
+            TimeoutError:
+                If there is no place in the pool or the prediction does not end within `timeout` seconds.
+            ValueError:
+                If an unknown model name is provided.
+
+        Returns:
+            np.ndarray[R]:
+                The predicted output values, in the same order as `values`.
+
+        """
+        values = np.asarray(values, dtype=np.int64)
+        if len(values) == 0:
+            return np.array([])
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError('The inference pool is busy')
+
+        # Values followed by the code (index in the list of classes) of each predicted label
+        try:
+            shm = SharedMemory(create=True, size=values.nbytes + len(values))
+        except BaseException:
+            self._slots.release()
+            raise
+
+        futures = []
+        try:
+            np.ndarray(values.shape, np.int64, shm.buf)[:] = values
+
+            n_chunks = max(1, min(self.n_workers, len(values) // self.min_chunk))
+            bounds = np.linspace(0, len(values), n_chunks + 1).astype(int)
+            executor = self._executor
+            futures = [
+                executor.submit(_predict_shared, shm.name, len(values), start, stop, model_name)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+
+            done, not_done = wait(futures, timeout=self.timeout, return_when=FIRST_EXCEPTION)
+            for future in done:
+                future.result()
+            if not_done:
+                for future in not_done:
+                    future.cancel()
+                raise TimeoutError('The prediction in the inference pool timed out')
+
+            classes = np.asarray(futures[0].result())
+            codes = np.ndarray(values.shape, np.uint8, shm.buf, values.nbytes)
+            labels = classes[codes]
+            del codes
+        finally:
+            self._release_when_done(futures, shm)
+
+        return labels
+
+    def _release_when_done(self, futures: list, shm: SharedMemory) -> None:
+        """Removes the shared memory block of a batch and frees its place in the pool when no worker uses them.
+
+        The chunks that a worker already started cannot be cancelled (after a timeout or an error in another chunk), so the block is
+        removed when the last of them ends, instead of while a worker can still have it attached.
+
+        Args:
+            futures (list):
+                The futures of the chunks of the batch.
+            shm (SharedMemory):
+                The shared memory block of the batch.
+
+        """
+        def release() -> None:
+            shm.close()
+            shm.unlink()
+            self._slots.release()
+
+        pending = [future for future in futures if not future.done()]
+        if not pending:
+            release()
+            return
+
+        remaining = [len(pending)]
+        lock = threading.Lock()
+
+        def chunk_done(future) -> None:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                release()
+
+        for future in pending:
+            future.add_done_callback(chunk_done)
+
+
+# Classifier and preprocessing function of a worker process of the inference pool
+_pool_classifier = None
+_pool_preprocess = None
+
+
+def _init_pool_worker(dir_path: str, preprocess: callable, compile_models: bool) -> None:
+    """Loads the models in a worker process of the inference pool.
+
+    Args:
+        dir_path (str):
+            The path of the directory with the models.
+        preprocess (callable):
+            Function that transforms an array of values into a feature matrix. If None, the preprocessor of the models is used.
+        compile_models (bool):
+            Whether the models are compiled.
+
+    """
+    global _pool_classifier, _pool_preprocess
+
+    # The worker ends if the server process ends without shutting down the pool (for example, killed with SIGTERM)
+    threading.Thread(target=_exit_with_parent, args=(multiprocessing.parent_process(),), daemon=True).start()
+
+    _pool_classifier = MyClassifier()
+    _pool_classifier.load_models(dir_path, lazy=False, replace=True)
+    if compile_models:
+        _pool_classifier.compile_models()
+    _pool_preprocess = preprocess
+
+
+def _exit_with_parent(parent: multiprocessing.process.BaseProcess) -> None:
+    wait_objects([parent.sentinel])
+    os._exit(0)
+
+
+def _worker_ready() -> bool:
+    return _pool_classifier is not None
+
+
+def _predict_shared(name: str, length: int, start: int, stop: int, model_name: str) -> list:
+    """Predicts a chunk of a batch stored in a shared memory block (see `InferencePool.predict_batch`).
+
+    Args:
+        name (str):
+            Name of the shared memory block.
+        length (int):
+            Number of values of the batch.
+        start (int):
+            Index of the first value of the chunk.
+        stop (int):
+            Index after the last value of the chunk.
+        model_name (str):
+            The name of the specific model to use for prediction. It can be None.
+
+    Returns:
+        list:
+            The sorted classes of the models, indexed by the codes written in the block.
+
+    """
+    classes = _pool_classifier.classes()
+
+    shm = SharedMemory(name=name)
+    try:
+        values = np.ndarray((length,), np.int64, shm.buf)
+        codes = np.ndarray((length,), np.uint8, shm.buf, length * 8)
+
+        labels = _pool_classifier.predict_batch(values[start:stop], _pool_preprocess, model_name)
+        codes[start:stop] = np.searchsorted(np.asarray(classes), labels)
+        del values, codes
+    finally:
+        shm.close()
+
+    return classes
@@ -1,2 +1,3 @@
 
-from .numbers import *
\ No newline at end of file
+from .numbers import *
+from .preprocessors import *
@@ -11,11 +11,12 @@ def load(train_parameters: tuple[int, int, int], test_parameters: tuple[int, int
     Args:
         train_parameters (tuple[int, int, int]): A tuple representing the training data range (start, end, step).
         test_parameters (tuple[int, int, int]): A tuple representing the testing data range (start, end, step).
-        preprocess (function, optional): A function for data preprocessing and representing. Defaults to None. if the value is None, the `number2remainder` function will be taken to represent the values.
+        preprocess (function, optional): A function for data preprocessing and representing. Defaults to None. if the value is None, the `number2remainder` function will be taken to represent the values. It can also be a registered preprocessor (see `preprocessors.Preprocessor`) or its name, whose batched implementation is used.
         
     Raises: 
-        ValueError: Invalid train data range. Start index cannot be greater than end index with a positive step or vice versa.
-        ValueError: Invalid test data range. Start index cannot be greater than end index with a positive step or vice versa.
+        ValueError: Unknown preprocessor name.
+        ValueError: Invalid train data range. Start index cannot be greater than end index with a positive step or vice versa (or the step is zero).
+        ValueError: Invalid test data range. Start index cannot be greater than end index with a positive step or vice versa (or the step is zero).
 
     Returns:
         tuple[np.array[Any], np.array[str], np.array[Any], np.array[str]]: 
@@ -25,19 +26,59 @@ def load(train_parameters: tuple[int, int, int], test_parameters: tuple[int, int
                 - Testing data (list of values)
                 - Testing labels (list of strings)
     """
-    if (train_parameters[0] > train_parameters[1] and train_parameters[2] > 0) or \
-       (train_parameters[0] < train_parameters[1] and train_parameters[2] < 0):
-        raise ValueError('Invalid train data range. Start index cannot be greater than end index with a positive step or vice versa.')
+    check_range(train_parameters, 'train')
+    check_range(test_parameters, 'test')
     
-    if (test_parameters[0] > test_parameters[1] and test_parameters[2] > 0) or \
-       (test_parameters[0] < test_parameters[1] and test_parameters[2] < 0):
-        raise ValueError('Invalid test data range. Start index cannot be greater than end index with a positive step or vice versa.')
+    from .preprocessors import Preprocessor, get_preprocessor
+    if isinstance(preprocess, str):
+        preprocess = get_preprocessor(preprocess)
     
     if preprocess is None: 
-        preprocess = number2remainder
+        return _load_vectorized(train_parameters, test_parameters)
+    
+    if isinstance(preprocess, Preprocessor):
+        return _load_vectorized(train_parameters, test_parameters, preprocess.batch)
         
     return _load(train_parameters, test_parameters, preprocess)
 
+def check_range(parameters: tuple[int, int, int], name: str) -> None:
+    """Validates a data range.
+
+    Args:
+        parameters (tuple[int, int, int]): A tuple representing the data range (start, end, step).
+        name (str): Name of the range, used in the error messages.
+        
+    Raises: 
+        ValueError: Start index cannot be greater than end index with a positive step or vice versa.
+        ValueError: Step cannot be zero.
+    """
+    if (parameters[0] > parameters[1] and parameters[2] > 0) or \
+       (parameters[0] < parameters[1] and parameters[2] < 0):
+        raise ValueError(f'Invalid {name} data range. Start index cannot be greater than end index with a positive step or vice versa.')
+    
+    if parameters[2] == 0:
+        raise ValueError(f'Invalid {name} data range. Step cannot be zero.')
+
+
+def iter_range(parameters: tuple[int, int, int], chunk_size: int):
+    """Produces the values of a range in chunks, without building the whole range.
+
+    Unlike the ranges of `load`, the end is not included (as in Python's `range`).
+
+    Args:
+        parameters (tuple[int, int, int]): A tuple representing the data range (start, stop, step).
+        chunk_size (int): Maximum number of values of each chunk.
+
+    Yields:
+        np.ndarray[np.int64]: The consecutive chunks of values of the range.
+    """
+    start, stop, step = parameters
+    length = len(range(start, stop, step))
+    
+    for offset in range(0, length, chunk_size):
+        yield start + offset * step + step * np.arange(min(chunk_size, length - offset), dtype=np.int64)
+
+
 def _load(train_parameters: tuple[int, int, int], test_parameters: tuple[int, int, int], preprocess : callable) -> tuple[np.ndarray[T], np.ndarray[str], np.ndarray[T], np.ndarray[str]]:
     """Loads data from a source based on train and test data ranges.
 
@@ -63,6 +104,45 @@ def _load(train_parameters: tuple[int, int, int], test_parameters: tuple[int, in
         np.array([preprocess(i) for i in test_values]), \
         np.array([_classify(i) for i in test_values])
 
+def _load_vectorized(train_parameters: tuple[int, int, int], test_parameters: tuple[int, int, int], preprocess_array: callable = None) -> tuple[np.ndarray[bool], np.ndarray[str], np.ndarray[bool], np.ndarray[str]]:
+    """Loads data based on train and test data ranges, using the `number2remainder` representation.
+
+    It is equivalent to `_load` with `number2remainder` as preprocess function, but works on whole ranges with NumPy operations.
+
+    Args:
+        train_parameters (tuple[int, int, int]): A tuple representing the training data range (start, end, step).
+        test_parameters (tuple[int, int, int]): A tuple representing the testing data range (start, end, step).
+        preprocess_array (function, optional): Function that transforms an array of values into a feature matrix. Defaults to None, which is `number2remainder_array`.
+
+    Returns:
+        tuple[np.array[bool], np.array[str], np.array[bool], np.array[str]]: 
+            A tuple containing four elements:
+                - Training data (list of values)
+                - Training labels (list of strings)
+                - Testing data (list of values)
+                - Testing labels (list of strings)
+    """
+    preprocess_array = preprocess_array or number2remainder_array
+    training_values = _range2array(train_parameters)
+    test_values = _range2array(test_parameters)
+    
+    return preprocess_array(training_values), \
+        classify_array(training_values), \
+        preprocess_array(test_values), \
+        classify_array(test_values)
+
+
+def _range2array(parameters: tuple[int, int, int]) -> np.ndarray[np.int64]:
+    """Builds the array of values of a data range.
+
+    Args:
+        parameters (tuple[int, int, int]): A tuple representing the data range (start, end, step). The end is included.
+
+    Returns:
+        np.ndarray[np.int64]: The values of the range.
+    """
+    return np.arange(parameters[0], parameters[1] + 1, parameters[2], dtype=np.int64)
+
 
 def _classify(n: int) -> str:
     """Classifies a number based on predetermined rules
@@ -89,3 +169,45 @@ def number2remainder(n :int) -> list[bool, bool]:
         list[bool, bool]: A list containing the remainders of `n`.
     """
     return [n % 3 == 0, n % 5 == 0]
+
+
+def classify_array(values: np.ndarray[np.int64]) -> np.ndarray[str]:
+    """Classifies an array of numbers based on predetermined rules
+
+    It is the vectorized version of `_classify`. The result has the same content and dtype as `np.array([_classify(n) for n in values])`.
+
+    Args:
+        values (np.ndarray[np.int64]): The numbers to classify.
+
+    Return:
+        np.ndarray[str]: The classification strings ("Fizz", "Buzz", "FizzBuzz", or "None")
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return np.array([])
+    
+    fizz = values % 3 == 0
+    buzz = values % 5 == 0
+    
+    labels = np.select([fizz & buzz, fizz, buzz], ['FizzBuzz', 'Fizz', 'Buzz'], 'None')
+    
+    # `np.array` takes the width of the longest string, so only use 'U8' if "FizzBuzz" is present
+    return labels.astype('U8' if np.any(fizz & buzz) else 'U4')
+
+
+def number2remainder_array(values: np.ndarray[np.int64]) -> np.ndarray[bool]:
+    """Check if each number of an array is divisible by 3 and 5.
+
+    It is the vectorized version of `number2remainder`. The result has the same content and dtype as `np.array([number2remainder(n) for n in values])`.
+
+    Arg:
+        values (np.ndarray[np.int64]): The integers for which to calculate the remainders.
+
+    Returns:
+        np.ndarray[bool]: A matrix with one row `[n % 3 == 0, n % 5 == 0]` for each value `n`.
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return np.array([])
+    
+    return np.column_stack((values % 3 == 0, values % 5 == 0)).astype(bool)
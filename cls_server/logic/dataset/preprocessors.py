@@ -0,0 +1,108 @@
+from functools import partial
+
+import numpy as np
+
+from .numbers import number2remainder, number2remainder_array
+
+from typing import TypeVar
+T = TypeVar('T')
+
+
+class Preprocessor:
+    """Named transformation of the input values into feature vectors, with a scalar and a batched implementation.
+
+    Calling the preprocessor transforms a batch of values (with the batched implementation). It is pickled by its name,
+    so it can be sent to worker processes, where the same registered preprocessor is used.
+    """
+
+    def __init__(self, name: str, scalar: callable, batch: callable):
+        """
+        Args:
+            name (str):
+                Name of the preprocessor in the registry.
+            scalar (callable):
+                Function that transforms a value into its feature vector.
+            batch (callable):
+                Function that transforms an array of values into a feature matrix (one row per value).
+        """
+        self.name = name
+        self.scalar = scalar
+        self.batch = batch
+
+    def __call__(self, values: np.ndarray[T]) -> np.ndarray:
+        """Transforms an array of values into a feature matrix (one row per value)."""
+        return self.batch(np.asarray(values))
+
+    def one(self, value: T) -> np.ndarray:
+        """Transforms a single value into a feature matrix of one row."""
+        return np.asarray([self.scalar(value)])
+
+    def __reduce__(self):
+        return get_preprocessor, (self.name,)
+
+    def __repr__(self) -> str:
+        return f'Preprocessor({self.name!r})'
+
+
+# Registered preprocessors, by name
+PREPROCESSORS = dict()
+
+# Preprocessor of the models saved without one (previous versions) and of the classifiers that do not choose one
+DEFAULT_PREPROCESSOR = 'number2remainder'
+
+
+def register_preprocessor(name: str, scalar: callable, batch: callable = None) -> Preprocessor:
+    """Registers a preprocessor.
+
+    The preprocessors used by worker processes must be registered when a module is imported, so the workers also have them.
+
+    Args:
+        name (str):
+            The name of the preprocessor, which is saved with the models.
+        scalar (callable):
+            Function that transforms a value into its feature vector (of fixed length).
+        batch (callable, optional):
+            Function that transforms an array of values into a feature matrix, with the same result as `scalar` row by row.
+            If None, `scalar` is called for each value.
+
+    Raises:
+        ValueError:
+            If there is already a preprocessor with the same name.
+
+    Returns:
+        Preprocessor:
+            The registered preprocessor.
+    """
+    if name in PREPROCESSORS:
+        raise ValueError(f'Preprocessor already registered: {name}')
+
+    PREPROCESSORS[name] = Preprocessor(name, scalar, batch or partial(_batch_from_scalar, scalar))
+    return PREPROCESSORS[name]
+
+
+def get_preprocessor(name: str) -> Preprocessor:
+    """Gets a registered preprocessor.
+
+    Args:
+        name (str):
+            The name of the preprocessor.
+
+    Raises:
+        ValueError:
+            If there is no preprocessor with that name.
+
+    Returns:
+        Preprocessor:
+            The preprocessor.
+    """
+    if name not in PREPROCESSORS:
+        raise ValueError(f'Unknown preprocessor: {name}')
+
+    return PREPROCESSORS[name]
+
+
+def _batch_from_scalar(scalar: callable, values: np.ndarray[T]) -> np.ndarray:
+    return np.array([scalar(value) for value in values.tolist()])
+
+
+register_preprocessor('number2remainder', number2remainder, number2remainder_array)
@@ -0,0 +1,235 @@
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Upper bounds of the buckets of the histograms of durations (seconds) and of sizes
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+
+class Counter:
+    """Value that only increases, with optional labels."""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str] = ()):
+        """
+        Args:
+            name (str):
+                Name of the metric.
+            documentation (str):
+                Description of the metric.
+            labelnames (tuple[str], optional):
+                Names of the labels of the metric. Defaults to ().
+
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increases the value of the metric for some labels.
+
+        Args:
+            amount (float, optional):
+                Increment. Defaults to 1.
+            **labels:
+                Value of each label of the metric.
+
+        """
+        key = _label_values(self, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        """Returns the (name, labels, value) samples of the metric."""
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Distribution of observed values in buckets, with optional labels."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str] = (), buckets: tuple[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            name (str):
+                Name of the metric.
+            documentation (str):
+                Description of the metric.
+            labelnames (tuple[str], optional):
+                Names of the labels of the metric. Defaults to ().
+            buckets (tuple[float], optional):
+                Sorted upper bounds of the buckets (a last bucket without bound is added). Defaults to `LATENCY_BUCKETS`.
+
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Records a value.
+
+        Args:
+            value (float):
+                The observed value.
+            **labels:
+                Value of each label of the metric.
+
+        """
+        key = _label_values(self, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Count of each bucket, sum and count of the values
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Records the seconds spent in a `with` block.
+
+        Args:
+            **labels:
+                Value of each label of the metric.
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        """Returns the (name, labels, value) samples of the metric: the cumulative buckets, the sum and the count."""
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+
+        samples = []
+        for key, counts in values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+            samples.append((self.name + '_sum', labels, counts[-2]))
+            samples.append((self.name + '_count', labels, counts[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """Set of metrics that are exported together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str] = ()) -> Counter:
+        """Creates and registers a counter (see `Counter`)."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str] = (), buckets: tuple[float] = LATENCY_BUCKETS) -> Histogram:
+        """Creates and registers a histogram (see `Histogram`)."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: callable) -> None:
+        """Registers a function that computes metrics when they are exported.
+
+        Args:
+            collector (callable):
+                Function without arguments that returns a list of (name, type, documentation, samples) tuples,
+                where samples is a list of (labels, value) pairs.
+
+        """
+        with self._lock:
+            self.collectors.append(collector)
+
+    def _register(self, metric: object) -> object:
+        with self._lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Exports the metrics in the Prometheus text format (version 0.0.4).
+
+        Returns:
+            str:
+                The exposition text.
+
+        """
+        with self._lock:
+            metrics = list(self.metrics)
+            collectors = list(self.collectors)
+
+        families = [(metric.name, metric.type, metric.documentation, metric.samples()) for metric in metrics]
+        for collector in collectors:
+            for name, metric_type, documentation, samples in collector():
+                families.append((name, metric_type, documentation, [(name, labels, value) for labels, value in samples]))
+
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _label_values(metric: object, labels: dict) -> tuple[str]:
+    """Gets the values of the labels of a metric, in the order of its label names.
+
+    Raises:
+        ValueError:
+            If the labels are not the ones of the metric.
+
+    """
+    if len(labels) != len(metric.labelnames) or any(name not in labels for name in metric.labelnames):
+        raise ValueError(f'Invalid labels for metric {metric.name}: {sorted(labels)}')
+    return tuple(str(labels[name]) for name in metric.labelnames)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(_format_label(name, value) for name, value in labels.items()) + '}'
+
+
+def _format_label(name: str, value: str) -> str:
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    return f'{name}="{value}"'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+# Metrics of the process
+REGISTRY = MetricsRegistry()
+
+MODEL_PREDICT_SECONDS = REGISTRY.histogram(
+    'cls_model_predict_seconds', 'Time of the predict calls of each model.', ('model',))
+PREPROCESS_SECONDS = REGISTRY.histogram(
+    'cls_preprocess_seconds', 'Time to transform the values into features.')
+TRAINING_FOLD_SECONDS = REGISTRY.histogram(
+    'cls_training_fold_seconds', 'Time to train and evaluate a model on a K-fold split.', ('model',))
+TRAINING_MODEL_SECONDS = REGISTRY.histogram(
+    'cls_training_model_seconds', 'Wall-clock time of the K-fold evaluation of a model.', ('model',))
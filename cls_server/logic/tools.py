@@ -1,9 +1,14 @@
 
 import os
-from collections import Counter
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
 
 from typing import TypeVar
 T = TypeVar('T')
+K = TypeVar('K')
 
 
 def create_directory(directory_path: str) -> None:
@@ -39,3 +44,281 @@ def most_frequent(data: list[T]) -> T:
     most_common_element = counter.most_common(1)[0]
     return most_common_element[0]
 
+
+def most_frequent_columns(data: np.ndarray) -> np.ndarray:
+    """
+    Finds the most frequent value of each column of a matrix.
+
+    Ties are resolved as in `most_frequent`: the value that appears first (lowest row) in the column wins.
+
+    Args:
+        data (np.ndarray): 
+            Matrix of shape (n_rows, n_columns). Each column is treated as an independent list of values.
+
+    Returns:
+        np.ndarray: 
+            Array of shape (n_columns,) with the most frequent value of each column.
+            
+    """
+    labels, codes = np.unique(data, return_inverse=True)
+    codes = codes.reshape(data.shape)
+    n_rows = data.shape[0]
+    
+    best_count = np.zeros(data.shape[1], dtype=np.int64)
+    best_first = np.full(data.shape[1], n_rows, dtype=np.int64)
+    best_code = np.zeros(data.shape[1], dtype=np.int64)
+    
+    for code in range(len(labels)):
+        matches = codes == code
+        count = matches.sum(axis=0)
+        first = np.where(count > 0, matches.argmax(axis=0), n_rows)
+        
+        better = (count > best_count) | ((count == best_count) & (first < best_first))
+        best_count = np.where(better, count, best_count)
+        best_first = np.where(better, first, best_first)
+        best_code = np.where(better, code, best_code)
+
+    return labels[best_code]
+
+
+def decided_votes(data: np.ndarray, remaining: int) -> np.ndarray:
+    """
+    Finds the winner of the vote of each column of a matrix, if the votes that remain cannot change it.
+
+    The vote of a column is decided when its most frequent value has more votes than any other value plus the `remaining` ones, 
+    so it wins whatever the remaining votes are, and without a tie.
+
+    Args:
+        data (np.ndarray): 
+            Matrix of shape (n_votes, n_columns) with the votes cast in each column.
+        remaining (int): 
+            Number of votes per column that have not been cast.
+
+    Returns:
+        np.ndarray: 
+            Array of shape (n_columns,) with the winner of each column, or None if the vote of any column is not decided.
+            
+    """
+    if data.shape[0] <= remaining:
+        return None
+    
+    labels, codes = np.unique(data, return_inverse=True)
+    counts = np.stack([(codes.reshape(data.shape) == code).sum(axis=0) for code in range(len(labels))])
+    
+    if len(labels) > 1:
+        top = np.partition(counts, -2, axis=0)
+        decided = top[-1] > top[-2] + remaining
+    else:
+        decided = counts[0] > remaining
+    
+    if not decided.all():
+        return None
+    
+    return labels[counts.argmax(axis=0)]
+
+
+def halving_survivors(scores: dict[K, float], factor: int, tolerance: float = 0.0) -> list[K]:
+    """
+    Selects the candidates that pass a round of successive halving.
+
+    The best `ceil(n / factor)` candidates pass, together with the ones tied with the last of them and the ones within
+    `tolerance` of the best score, so equal scores are never separated.
+
+    Args:
+        scores (dict[K, float]):
+            Score of each candidate (higher is better).
+        factor (int):
+            The inverse of the fraction of candidates that pass.
+        tolerance (float, optional):
+            The candidates whose score is at least the best one minus `tolerance` always pass. Defaults to 0.0.
+
+    Returns:
+        list[K]:
+            The candidates that pass, in the order of `scores`.
+
+    """
+    ranked = sorted(scores.values(), reverse=True)
+    cutoff = min(ranked[-(-len(ranked) // factor) - 1], ranked[0] - tolerance)
+
+    return [candidate for candidate, score in scores.items() if score >= cutoff]
+
+
+def unique_rows(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the unique rows of a matrix, and which of them is each row.
+
+    The rows of boolean matrices with up to `_MAX_BIT_FEATURES` columns are encoded as integers and counted with `np.bincount`,
+    which takes linear time. The other matrices are sorted with `np.unique`.
+
+    Args:
+        X (np.ndarray):
+            Matrix of shape (n_rows, n_features).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]:
+            The unique rows, and the index of the unique row of each row of `X` (so `unique[inverse]` is `X`).
+
+    """
+    X = np.asarray(X)
+
+    if X.dtype == np.bool_ and X.ndim == 2 and X.shape[1] <= _MAX_BIT_FEATURES:
+        n_features = X.shape[1]
+        codes = X.astype(np.int64) @ (1 << np.arange(n_features, dtype=np.int64))
+        present = np.bincount(codes, minlength=1 << n_features) > 0
+        unique_codes = np.flatnonzero(present)
+        inverse = (np.cumsum(present) - 1)[codes]
+        unique = (unique_codes[:, np.newaxis] >> np.arange(n_features)) & 1
+        return unique.astype(np.bool_), inverse
+
+    unique, inverse = np.unique(X, axis=0, return_inverse=True)
+    return unique, inverse.reshape(-1)
+
+
+# Maximum number of columns of the boolean matrices whose rows `unique_rows` encodes as integers (a table of 2 ** n counts is used)
+_MAX_BIT_FEATURES = 16
+
+
+def unique_samples(X: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collapses the repeated (features, label) rows of a dataset into unique rows with their number of occurrences.
+
+    Args:
+        X (np.ndarray):
+            Feature matrix of shape (n_samples, n_features).
+        y (np.ndarray):
+            Label of each row.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]:
+            The unique rows of `X`, their labels and the number of times that each (row, label) pair appears in the dataset.
+
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+
+    _, label_codes = np.unique(y, return_inverse=True)
+    samples = np.column_stack([X.reshape(len(X), -1), label_codes])
+    _, index, counts = np.unique(samples, axis=0, return_index=True, return_counts=True)
+
+    return X[index], y[index], counts
+
+
+class LRUCache:
+    """
+    Thread-safe cache with least recently used (LRU) eviction.
+
+    The cache is bounded by a number of entries and, optionally, by an estimation of the bytes used by the keys and values.
+    It counts the hits and misses of the lookups.
+    
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int = None):
+        """
+        Args:
+            max_entries (int): 
+                Maximum number of entries.
+            max_bytes (int, optional): 
+                Maximum number of bytes used by the keys and values (estimated with `sys.getsizeof`). If None, there is no limit. Defaults to None.
+                
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        
+    def get(self, key: K, default: T = None) -> T:
+        """
+        Gets the value of a key, marking it as the most recently used.
+
+        Args:
+            key (K): 
+                The key to look up.
+            default (T, optional): 
+                Value returned if the key is not in the cache. Defaults to None.
+
+        Returns:
+            T: 
+                The value of the key, or `default`.
+                
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        
+    def put(self, key: K, value: T) -> None:
+        """
+        Stores the value of a key, evicting the least recently used entries if the limits are exceeded.
+
+        Args:
+            key (K): 
+                The key.
+            value (T): 
+                The value.
+                
+        """
+        size = _sizeof(key) + _sizeof(value)
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            
+            self._entries[key] = (value, size)
+            self._bytes += size
+            
+            while self._entries and (len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                
+    def clear(self) -> None:
+        """
+        Removes all the entries. The hit and miss counters are kept.
+        
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            
+    def stats(self) -> dict:
+        """
+        Returns the usage statistics of the cache.
+
+        Returns:
+            dict: 
+                Dictionary with the keys 'hits', 'misses', 'entries' and 'bytes'.
+                
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+
+def _sizeof(obj: object) -> int:
+    """
+    Estimates the bytes used by an object, including the items of tuples.
+
+    Args:
+        obj (object): 
+            The object.
+
+    Returns:
+        int: 
+            The estimated number of bytes.
+            
+    """
+    if isinstance(obj, tuple):
+        return sys.getsizeof(obj) + sum(_sizeof(item) for item in obj)
+    return sys.getsizeof(obj)
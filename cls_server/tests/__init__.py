@@ -1,2 +0,0 @@
-
-from .test_service import *
\ No newline at end of file
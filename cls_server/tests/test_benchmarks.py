@@ -0,0 +1,63 @@
+from django.test import SimpleTestCase
+import tempfile
+from os import path
+
+from benchmarks import BenchmarkRunner, compare_results, load_results, save_results
+
+
+class BenchmarksTestCase(SimpleTestCase):
+    
+    def test_results_round_trip(self):
+        """
+        Tests that the runner records the measured times, and that a results file can be saved and loaded.
+        
+        """
+        runner = BenchmarkRunner(repeat=3, warmup=0, verbose=False)
+        calls = []
+        
+        result = runner.time('append', lambda: calls.append(1), number=2)
+        
+        self.assertEqual(len(calls), 6)
+        self.assertEqual(result['metric'], 'seconds')
+        self.assertEqual(result['repeat'], 3)
+        self.assertLessEqual(result['min'], result['value'])
+        
+        with self.assertRaises(ValueError):
+            runner.record('append', result)
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            file_path = path.join(dir_path, 'results.json')
+            save_results(runner.report(), file_path)
+            
+            self.assertEqual(load_results(file_path)['results'], runner.results)
+            
+            with open(file_path, 'w') as f:
+                f.write('{}')
+            with self.assertRaises(ValueError):
+                load_results(file_path)
+        
+    def test_compare_results(self):
+        """
+        Tests that slower times and lower throughputs beyond the threshold are regressions, and that new benchmarks are ignored.
+        
+        """
+        baseline = {'results': {
+            'predict': {'metric': 'seconds', 'value': 1.0},
+            'load': {'metric': 'seconds', 'value': 1.0},
+            'http': {'metric': 'requests_per_second', 'value': 100.0},
+        }}
+        current = {'results': {
+            'predict': {'metric': 'seconds', 'value': 1.5},
+            'load': {'metric': 'seconds', 'value': 1.05},
+            'http': {'metric': 'requests_per_second', 'value': 200.0},
+            'new': {'metric': 'seconds', 'value': 1.0},
+        }}
+        
+        statuses = {comparison['name']: comparison['status'] for comparison in compare_results(baseline, current, threshold=0.1)}
+        
+        self.assertEqual(statuses, {'predict': 'regression', 'load': 'unchanged', 'http': 'improvement'})
+        
+        current['results']['http']['value'] = 50.0
+        statuses = {comparison['name']: comparison['status'] for comparison in compare_results(baseline, current, threshold=0.1)}
+        
+        self.assertEqual(statuses['http'], 'regression')
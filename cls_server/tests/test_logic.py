@@ -0,0 +1,637 @@
+from django.test import SimpleTestCase
+import numpy as np
+import pickle
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import Future
+from multiprocessing.shared_memory import SharedMemory
+from os import path
+
+from logic.classifier import InferencePool, LazyModel, LookupModel, MyClassifier, artifact_key, build_or_load_models
+from logic.dataset.numbers import _load, load, number2remainder, number2remainder_array
+from logic.dataset.preprocessors import PREPROCESSORS, get_preprocessor, register_preprocessor
+from logic.metrics import MetricsRegistry
+from logic.tools import LRUCache, decided_votes, halving_survivors, most_frequent, most_frequent_columns, unique_rows, unique_samples
+
+
+def _noisy_dataset() -> tuple[np.ndarray, np.ndarray]:
+    # Training data where 20% of the labels are random, so the models do not reach the same accuracy
+    X_train, y_train, _, _ = load((1000, 1600, 1), (1, 100, 1))
+    y_train = y_train.copy()
+    rng = np.random.default_rng(0)
+    noise = rng.random(len(y_train)) < 0.2
+    y_train[noise] = rng.choice(['Fizz', 'Buzz', 'FizzBuzz', 'None'], noise.sum())
+    return X_train, y_train
+
+
+class NumbersDatasetTestCase(SimpleTestCase):
+    
+    def test_vectorized_load_matches_original(self):
+        """
+        Tests that `load` with the default preprocess returns exactly the same arrays (content and dtype) as the element by element construction.
+        
+        """
+        for train_parameters, test_parameters in [((1000, 2000, 1), (1, 100, 1)), ((20, 1, -3), (1, 14, 1)), ((-50, 50, 7), (1, 1, 1))]:
+            expected = _load(train_parameters, test_parameters, number2remainder)
+            result = load(train_parameters, test_parameters)
+            
+            for expected_array, result_array in zip(expected, result):
+                self.assertEqual(result_array.dtype, expected_array.dtype)
+                np.testing.assert_array_equal(result_array, expected_array)
+
+
+class MyClassifierTestCase(SimpleTestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.classifier = MyClassifier()
+        cls.classifier.build_models(load((1000, 1300, 1), (1, 100, 1)))
+        
+    def test_predict_batch_matches_predict(self):
+        """
+        Tests that `predict_batch` returns, for each model and for the ensemble, the same classification as calling `predict` value by value.
+        
+        """
+        values = list(range(-30, 60))
+        
+        for model_name in [None] + self.classifier.models_name():
+            expected = [self.classifier.predict(value, lambda x: [number2remainder(x)], model_name) for value in values]
+            result = self.classifier.predict_batch(values, number2remainder_array, model_name)
+            
+            self.assertEqual(result.tolist(), expected, f'Batch prediction differs for model {model_name}')
+            
+    def test_predict_batch_unknown_model_name(self):
+        
+        with self.assertRaises(ValueError):
+            self.classifier.predict_batch([1, 2, 3], lambda batch: [number2remainder(x) for x in batch], 'unknown_model')
+            
+    def test_preprocessors(self):
+        """
+        Tests that the registered preprocessors are pickled by name, that the classifier uses the batched or scalar implementation of its own 
+        preprocessor by default, and that the preprocessor is saved with the models and checked when they are used.
+        
+        """
+        preprocessor = get_preprocessor('number2remainder')
+        values = list(range(-30, 60))
+        
+        self.assertIs(pickle.loads(pickle.dumps(preprocessor)), preprocessor)
+        np.testing.assert_array_equal(preprocessor(values), np.array([number2remainder(value) for value in values]))
+        self.assertEqual(
+            self.classifier.predict_batch(values).tolist(), 
+            [self.classifier.predict(value) for value in values]
+        )
+        self.assertEqual(
+            self.classifier.predict_batch(values, 'number2remainder').tolist(), 
+            self.classifier.predict_batch(values, number2remainder_array).tolist()
+        )
+        
+        with self.assertRaises(ValueError):
+            self.classifier.predict_batch(values, 'unknown')
+        with self.assertRaises(ValueError):
+            MyClassifier(preprocessor='unknown')
+        
+        register_preprocessor('number2remainder7', lambda n: [n % 3 == 0, n % 5 == 0, n % 7 == 0])
+        try:
+            with self.assertRaises(ValueError):
+                register_preprocessor('number2remainder7', number2remainder)
+            with self.assertRaises(ValueError):
+                self.classifier.predict_batch(values, 'number2remainder7')
+            
+            classifier = MyClassifier(preprocessor='number2remainder7')
+            classifier.build_models(load((1000, 1300, 1), (1, 100, 1), 'number2remainder7'))
+            
+            with tempfile.TemporaryDirectory() as dir_path:
+                classifier.save_models(dir_path)
+                
+                loaded = MyClassifier()
+                loaded.load_models(dir_path, replace=True)
+                
+                self.assertEqual(loaded.preprocessor, 'number2remainder7')
+                self.assertEqual(loaded.predict_batch(values).tolist(), classifier.predict_batch(values).tolist())
+                
+                with self.assertRaises(ValueError):
+                    self.classifier.load_models(dir_path)
+                
+                # A reload during a prediction (here, while the values are preprocessed) does not mix the models of the two snapshots
+                reloaded = MyClassifier()
+                reloaded._set_models(dict(self.classifier.models))
+                expected = self.classifier.predict_batch(values).tolist()
+                
+                def preprocess_and_reload(batch):
+                    reloaded.load_models(dir_path, lazy=False, replace=True)
+                    return number2remainder_array(batch)
+                
+                self.assertEqual(reloaded.predict_batch(values, preprocess_and_reload).tolist(), expected)
+                self.assertEqual(reloaded.preprocessor, 'number2remainder7')
+                self.assertEqual(reloaded.predict_batch(values).tolist(), classifier.predict_batch(values).tolist())
+        finally:
+            PREPROCESSORS.pop('number2remainder7')
+        
+    def test_unique_rows(self):
+        """
+        Tests that `unique_rows` finds the same rows as `np.unique` for boolean (bit encoded) and other matrices, and that the inverse index rebuilds the matrix.
+        
+        """
+        rng = np.random.default_rng(0)
+        
+        for X in [rng.random((500, 3)) < 0.5, rng.integers(0, 3, (500, 2)), rng.random((500, 20)) < 0.1]:
+            unique, inverse = unique_rows(X)
+            
+            self.assertEqual(unique.dtype, X.dtype)
+            self.assertTrue(np.array_equal(unique[inverse], X))
+            self.assertEqual(len(unique), len(np.unique(X, axis=0)))
+        
+    def test_predict_batch_predicts_distinct_features(self):
+        """
+        Tests that the models of `predict_batch` only receive the distinct feature vectors of the batch.
+        
+        """
+        model = self.classifier.models['decision_tree']
+        n_rows = []
+        
+        class RecordingModel:
+            def predict(self, X):
+                n_rows.append(len(X))
+                return model.predict(X)
+        
+        classifier = MyClassifier()
+        classifier._set_models({'decision_tree': RecordingModel()})
+        values = np.arange(-3000, 3000)
+        
+        result = classifier.predict_batch(values, number2remainder_array, 'decision_tree')
+        
+        self.assertEqual(n_rows, [4])
+        self.assertEqual(result.tolist(), self.classifier.predict_batch(values, number2remainder_array, 'decision_tree').tolist())
+        
+    def test_most_frequent_columns_ties(self):
+        """
+        Tests that `most_frequent_columns` resolves ties like `most_frequent` (first value found wins).
+        
+        """
+        data = np.array([
+            ['b', 'a', 'c'],
+            ['a', 'a', 'c'],
+            ['a', 'b', 'b'],
+            ['b', 'b', 'b'],
+        ])
+        
+        expected = [most_frequent(list(column)) for column in data.T]
+        
+        self.assertEqual(most_frequent_columns(data).tolist(), expected)
+        
+    def test_decided_votes(self):
+        """
+        Tests that a vote is decided only when the remaining votes cannot change the winner, nor tie with it.
+        
+        """
+        data = np.array([
+            ['a', 'b'],
+            ['a', 'b'],
+            ['a', 'c'],
+        ])
+        
+        self.assertEqual(decided_votes(data, 0).tolist(), ['a', 'b'])
+        self.assertEqual(decided_votes(data, 1), None)
+        self.assertEqual(decided_votes(data[:, :1], 2).tolist(), ['a'])
+        self.assertEqual(decided_votes(data[:, :1], 3), None)
+        
+    def test_early_exit_matches_ensemble(self):
+        """
+        Tests that the ensemble with early exit predicts the same as calling all the models, and that it skips models.
+        
+        """
+        classifier = MyClassifier(early_exit=True)
+        classifier._set_models(dict(self.classifier.models))
+        values = list(range(-30, 60))
+        
+        for _ in range(3):
+            np.testing.assert_array_equal(
+                classifier.predict_batch(values, number2remainder_array), 
+                self.classifier.predict_batch(values, number2remainder_array)
+            )
+        for value in values:
+            self.assertEqual(
+                classifier.predict(value, lambda x: [number2remainder(x)]), 
+                self.classifier.predict(value, lambda x: [number2remainder(x)])
+            )
+            
+        stats = classifier.ensemble_stats()
+        
+        self.assertEqual(stats['predictions'], 3 + len(values))
+        self.assertGreater(stats['early_exits'], 0)
+        self.assertEqual(set(stats['models']), set(classifier.models_name()))
+        self.assertGreater(sum(model_stats['skipped'] for model_stats in stats['models'].values()), 0)
+        
+    def test_models_listeners(self):
+        """
+        Tests that the models listeners are called every time the models change, after the models are replaced.
+        
+        """
+        classifier = MyClassifier()
+        calls = []
+        classifier.add_models_listener(lambda changed: calls.append(changed.models_name()))
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            self.classifier.save_models(dir_path)
+            classifier.load_models(dir_path)
+            classifier.compile_models()
+        
+        self.assertEqual(calls, [self.classifier.models_name()] * 2)
+        
+    def test_load_models_memory_mapped(self):
+        """
+        Tests that the arrays of the loaded models are memory-mapped, and that the models predict the same as the saved ones.
+        
+        """
+        values = list(range(-30, 60))
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            self.classifier.save_models(dir_path)
+            loaded = MyClassifier()
+            loaded.load_models(dir_path)
+            
+            self.assertEqual(loaded.models_name(), self.classifier.models_name())
+            self.assertIsInstance(loaded.models['knn']._fit_X, np.memmap)
+            self.assertIsInstance(loaded.models['svc'].support_vectors_, np.memmap)
+            for model_name in [None] + loaded.models_name():
+                np.testing.assert_array_equal(
+                    loaded.predict_batch(values, number2remainder_array, model_name), 
+                    self.classifier.predict_batch(values, number2remainder_array, model_name)
+                )
+                
+    def test_load_models_lazily(self):
+        """
+        Tests that the loaded models are read the first time they are used, and only the used ones.
+        
+        """
+        with tempfile.TemporaryDirectory() as dir_path:
+            self.classifier.save_models(dir_path)
+            loaded = MyClassifier()
+            loaded.load_models(dir_path)
+            
+            self.assertEqual(loaded.models_name(), self.classifier.models_name())
+            self.assertTrue(all(isinstance(model, LazyModel) and not model.is_loaded() for model in loaded.models.values()))
+            
+            loaded.predict_batch([1, 3, 5, 15], number2remainder_array, 'knn')
+            
+            self.assertEqual([model_name for model_name, model in loaded.models.items() if model.is_loaded()], ['knn'])
+            
+    def test_import_does_not_load_sklearn(self):
+        
+        code = "import sys, logic.classifier; print(any(name.split('.')[0] in ('sklearn', 'scipy', 'joblib') for name in sys.modules))"
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=path.dirname(path.dirname(__file__))).stdout
+        
+        self.assertEqual(output.strip(), 'False')
+        
+    def test_load_models_replace(self):
+        """
+        Tests that `replace` discards the current models, and that saving again into a directory does not change the models already loaded from it.
+        
+        """
+        values = list(range(-30, 60))
+        expected = self.classifier.predict_batch(values, number2remainder_array)
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            self.classifier.save_models(dir_path)
+            classifier = MyClassifier()
+            classifier._set_models({'other': self.classifier.models['knn']})
+            classifier.load_models(dir_path, lazy=False, replace=True)
+            
+            self.assertEqual(classifier.models_name(), self.classifier.models_name())
+            
+            self.classifier.save_models(dir_path)
+            
+            np.testing.assert_array_equal(classifier.predict_batch(values, number2remainder_array), expected)
+            
+    def test_load_legacy_pickle_models(self):
+        
+        with tempfile.TemporaryDirectory() as dir_path:
+            for model_name, model in self.classifier.models.items():
+                with open(path.join(dir_path, model_name + '.pkl'), 'wb') as f:
+                    pickle.dump(model, f)
+            loaded = MyClassifier()
+            loaded.load_models(dir_path)
+            
+            self.assertEqual(sorted(loaded.models_name()), sorted(self.classifier.models_name()))
+
+
+class MetricsTestCase(SimpleTestCase):
+    
+    def test_histogram_buckets_and_render(self):
+        """
+        Tests that the histograms count the values in cumulative buckets, and the Prometheus text format of the registry.
+        
+        """
+        registry = MetricsRegistry()
+        histogram = registry.histogram('test_seconds', 'Test histogram.', ('stage',), buckets=(0.1, 1.0))
+        counter = registry.counter('test_total', 'Test counter.')
+        registry.add_collector(lambda: [('test_entries', 'gauge', 'Test gauge.', [({'cache': 'a'}, 3)])])
+        
+        histogram.observe(0.05, stage='parse')
+        histogram.observe(0.5, stage='parse')
+        histogram.observe(2, stage='parse')
+        counter.inc()
+        counter.inc(2)
+        
+        lines = registry.render().splitlines()
+        
+        self.assertIn('# TYPE test_seconds histogram', lines)
+        self.assertIn('test_seconds_bucket{stage="parse",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="parse",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="parse",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{stage="parse"} 2.55', lines)
+        self.assertIn('test_seconds_count{stage="parse"} 3', lines)
+        self.assertIn('test_total 3', lines)
+        self.assertIn('test_entries{cache="a"} 3', lines)
+        
+        with self.assertRaises(ValueError):
+            histogram.observe(1, model='svc')
+
+
+class PredictionCacheTestCase(SimpleTestCase):
+    
+    def test_lru_cache_eviction_and_counters(self):
+        
+        cache = LRUCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['hits'], 3)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['entries'], 2)
+        
+        cache = LRUCache(max_entries=100, max_bytes=1)
+        cache.put('a', 1)
+        self.assertEqual(cache.stats()['entries'], 0)
+        
+    def test_cached_predictions_match_and_are_invalidated(self):
+        """
+        Tests that predictions with a cache (keyed by features or by value) are the same as without it, and that the cache is emptied when the models are replaced.
+        
+        """
+        reference = MyClassifier()
+        reference.build_models(load((1000, 1300, 1), (1, 100, 1)))
+        values = list(range(-40, 40))
+        
+        for cache_key in ['features', 'value']:
+            classifier = MyClassifier(cache_size=1000, cache_key=cache_key)
+            classifier._set_models(dict(reference.models))
+            
+            for model_name in [None, 'decision_tree']:
+                expected = reference.predict_batch(values, number2remainder_array, model_name).tolist()
+                
+                self.assertEqual(classifier.predict_batch(values, number2remainder_array, model_name).tolist(), expected)
+                self.assertEqual(classifier.predict_batch(values, number2remainder_array, model_name).tolist(), expected)
+                self.assertEqual(classifier.predict(values[3], lambda x: [number2remainder(x)], model_name), expected[3])
+            
+            self.assertGreater(classifier.cache_stats()['hits'], 0)
+            
+            classifier.compile_models()
+            self.assertEqual(classifier.cache_stats()['entries'], 0)
+
+
+class CompiledModelsTestCase(SimpleTestCase):
+    
+    def test_compiled_models_match_estimators(self):
+        """
+        Tests that the lookup tables produced by `compile_models` predict the same as the original estimators, both for boolean features (table) and for any other input (estimator).
+        
+        """
+        classifier = MyClassifier()
+        classifier.build_models(load((1000, 1300, 1), (1, 100, 1)))
+        estimators = dict(classifier.models)
+        
+        self.assertEqual(classifier.compile_models(), classifier.models_name())
+        
+        X = number2remainder_array(np.arange(-100, 100))
+        for model_name, model in classifier.models.items():
+            self.assertIsInstance(model, LookupModel)
+            np.testing.assert_array_equal(model.predict(X), estimators[model_name].predict(X))
+            np.testing.assert_array_equal(model.predict(X.astype(float)), estimators[model_name].predict(X.astype(float)))
+
+
+class ParallelEvaluationTestCase(SimpleTestCase):
+    
+    def test_parallel_evaluation_matches_sequential(self):
+        """
+        Tests that evaluating the (model, fold) pairs in a pool of threads or processes gives the same accuracies as the sequential evaluation, and that the times of each model are recorded.
+        
+        """
+        X_train, y_train, _, _ = load((1000, 1300, 1), (1, 100, 1))
+        model_names = ['decision_tree', 'naive_bayes']
+        
+        expected = MyClassifier()._evaluate_models(model_names, X_train, y_train)
+        
+        for backend in ['thread', 'process']:
+            classifier = MyClassifier(n_jobs=2, backend=backend)
+            
+            self.assertEqual(classifier._evaluate_models(model_names, X_train, y_train), expected, f'Results differ with the {backend} backend')
+            self.assertEqual(sorted(classifier.evaluation_times.keys()), sorted(model_names))
+            self.assertEqual(len(classifier.evaluation_times['naive_bayes']['fold_times']), 10)
+            
+    def test_dedupe_matches_full_training(self):
+        """
+        Tests that training on the unique rows weighted by their counts gives the same K-fold accuracies as training on all the rows, with noisy labels.
+        
+        """
+        X_train, y_train = _noisy_dataset()
+        
+        X_unique, y_unique, counts = unique_samples(X_train, y_train)
+        
+        self.assertEqual(counts.sum(), len(X_train))
+        self.assertEqual(len(set(zip(map(tuple, X_unique.tolist()), y_unique.tolist()))), len(X_unique))
+        
+        model_names = MyClassifier().generic_models
+        expected = MyClassifier()._evaluate_models(model_names, X_train, y_train)
+        
+        self.assertEqual(MyClassifier(dedupe=True)._evaluate_models(model_names, X_train, y_train), expected)
+        
+    def test_unsupported_backend(self):
+        
+        with self.assertRaises(ValueError):
+            MyClassifier(n_jobs=2, backend='unknown')
+
+
+class ModelSelectionTestCase(SimpleTestCase):
+    
+    def test_halving_survivors(self):
+        
+        scores = {'a': 0.9, 'b': 0.8, 'c': 0.8, 'd': 0.5, 'e': 0.79, 'f': 0.1}
+        
+        self.assertEqual(halving_survivors(scores, 3), ['a', 'b', 'c'])
+        self.assertEqual(halving_survivors(scores, 2), ['a', 'b', 'c'])
+        self.assertEqual(halving_survivors(scores, 6), ['a'])
+        self.assertEqual(halving_survivors(scores, 6, tolerance=0.15), ['a', 'b', 'c', 'e'])
+        
+    def test_halving_keeps_the_best_models(self):
+        """
+        Tests that the successive halving selection drops the worse models early, and keeps the same best models with the same accuracies as the exhaustive cross-validation.
+        
+        """
+        X_train, y_train = _noisy_dataset()
+        model_names = MyClassifier().generic_models
+        
+        expected = MyClassifier()._evaluate_models(model_names, X_train, y_train)
+        relation = MyClassifier(selection='halving')._select_models(model_names, X_train, y_train)
+        
+        best = [model_name for model_name, value in expected.items() if value == max(expected.values())]
+        
+        self.assertNotIn('knn', relation)
+        self.assertEqual([model_name for model_name, value in relation.items() if value == max(relation.values())], best)
+        self.assertEqual({model_name: expected[model_name] for model_name in best}, {model_name: relation[model_name] for model_name in best})
+        
+        with self.assertRaises(ValueError):
+            MyClassifier(selection='random')
+        
+    def test_halving_stops_with_a_single_survivor(self):
+        """
+        Tests that the successive halving selection stops as soon as a single model is left, without evaluating it on more folds.
+        
+        """
+        X_train, y_train = _noisy_dataset()
+        evaluations = []
+        
+        classifier = MyClassifier(selection='halving', halving_factor=2, halving_min_folds=2)
+        relation = classifier._select_models(['decision_tree', 'knn'], X_train, y_train, lambda done, total: evaluations.append(total))
+        
+        n_folds = len(classifier.evaluation_times['decision_tree']['fold_times'])
+        
+        # Both models are evaluated on the same folds until knn is dropped, and the last model is not evaluated on more folds
+        self.assertEqual(list(relation), ['decision_tree'])
+        self.assertLess(n_folds, 10)
+        self.assertEqual(len(evaluations), 2 * n_folds)
+        
+    def test_build_progress(self):
+        """
+        Tests that the build reports the progress of the evaluation of every (model, fold) pair of each round and of the training of the best models.
+        
+        """
+        dataset = load((1000, 1300, 1), (1, 100, 1))
+        
+        for selection in ('exhaustive', 'halving'):
+            events = []
+            classifier = MyClassifier(selection=selection)
+            classifier.generic_models = ['decision_tree', 'naive_bayes', 'knn']
+            classifier.build_models(dataset, progress=lambda *event: events.append(event))
+            
+            evaluation = [event for event in events if event[0] == 'evaluation']
+            self.assertEqual(evaluation[0][1], 1)
+            self.assertTrue(all(done <= total for _, done, total in evaluation))
+            self.assertEqual(evaluation[-1][1], evaluation[-1][2])
+            self.assertEqual(events[-1], ('training', len(classifier.models), len(classifier.models)))
+
+
+class ArtifactCacheTestCase(SimpleTestCase):
+    
+    def test_build_or_load_models_reuses_artifacts(self):
+        """
+        Tests that the first call builds and saves the models, and the second one loads the same models (in the same order) from the cache.
+        
+        """
+        train_parameters, test_parameters = (1000, 1100, 1), (1, 100, 1)
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            built = MyClassifier()
+            self.assertFalse(build_or_load_models(built, train_parameters, test_parameters, cache_dir))
+            
+            loaded = MyClassifier()
+            self.assertTrue(build_or_load_models(loaded, train_parameters, test_parameters, cache_dir))
+            
+            self.assertEqual(loaded.models_name(), built.models_name())
+            
+            values = list(range(1, 31))
+            np.testing.assert_array_equal(
+                loaded.predict_batch(values, number2remainder_array), 
+                built.predict_batch(values, number2remainder_array)
+            )
+            
+    def test_artifact_key_depends_on_configuration(self):
+        
+        classifier = MyClassifier()
+        
+        self.assertEqual(artifact_key(classifier, (1, 10, 1), (1, 5, 1)), artifact_key(classifier, (1, 10, 1), (1, 5, 1)))
+        self.assertNotEqual(artifact_key(classifier, (1, 10, 1), (1, 5, 1)), artifact_key(classifier, (1, 11, 1), (1, 5, 1)))
+
+
+class InferencePoolTestCase(SimpleTestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.classifier = MyClassifier()
+        cls.classifier.build_models(load((1000, 1300, 1), (1, 100, 1)))
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.classifier.save_models(cls.dir.name)
+        cls.pool = InferencePool(cls.dir.name, number2remainder_array, n_workers=2, max_pending=1, timeout=30, min_chunk=100)
+        
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        cls.dir.cleanup()
+        super().tearDownClass()
+        
+    def test_predict_batch_matches_classifier(self):
+        """
+        Tests that the pool (splitting the batch among the workers) predicts the same as the classifier, for each model and for the ensemble.
+        
+        """
+        values = np.arange(-300, 600)
+        
+        for model_name in [None] + self.classifier.models_name():
+            np.testing.assert_array_equal(
+                self.pool.predict_batch(values, model_name), 
+                self.classifier.predict_batch(values, number2remainder_array, model_name)
+            )
+            
+        self.assertEqual(self.pool.predict_batch([]).tolist(), [])
+        
+    def test_predict_batch_unknown_model_name(self):
+        
+        with self.assertRaises(ValueError):
+            self.pool.predict_batch(np.arange(10), 'unknown_model')
+            
+    def test_back_pressure(self):
+        """
+        Tests that a batch that does not get a place in the pool within the timeout is rejected.
+        
+        """
+        self.pool._slots.acquire()
+        self.pool.timeout = 0.1
+        try:
+            with self.assertRaises(TimeoutError):
+                self.pool.predict_batch(np.arange(10))
+        finally:
+            self.pool.timeout = 30
+            self.pool._slots.release()
+            
+    def test_shared_memory_released_after_running_chunks(self):
+        """
+        Tests that the shared memory block of a batch that timed out is removed (and its place in the pool freed) only when its running chunks end.
+        
+        """
+        running = Future()
+        running.set_running_or_notify_cancel()
+        finished = Future()
+        finished.set_result(None)
+        
+        self.pool._slots.acquire()
+        shm = SharedMemory(create=True, size=8)
+        self.pool._release_when_done([finished, running], shm)
+        
+        # The block can still be attached by the worker of the running chunk
+        SharedMemory(name=shm.name).close()
+        self.assertFalse(self.pool._slots.acquire(timeout=0))
+        
+        running.set_result(None)
+        
+        with self.assertRaises(FileNotFoundError):
+            SharedMemory(name=shm.name)
+        self.assertTrue(self.pool._slots.acquire(timeout=0))
+        self.pool._slots.release()
\ No newline at end of file
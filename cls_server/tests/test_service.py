@@ -1,8 +1,18 @@
 
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+import asyncio
+import io
+import os
+import tempfile
+import numpy as np
 import requests
 import json
 
+from cls_server.batching import PredictionBatcher
+from cls_server.codec import BACKENDS, JSONCodec
+from cls_server.reloading import ModelWatcher
+from cls_server.training import TrainingJobs
+
 class NumberClassifierTestCase(TestCase):
     
     def test_list_models_successful_response_and_structure(self):
@@ -29,6 +39,30 @@ class NumberClassifierTestCase(TestCase):
             models_name = data['models']
             self.assertIsInstance(models_name, list, "The response should contain a models name list")
             
+    def test_list_models_etag(self):
+        """
+        Tests that the list of models has a strong ETag, and that a request with the same ETag in `If-None-Match` gets a 304 response without body.
+        
+        """
+        client = Client()
+        
+        response = client.get('http://127.0.0.1:8000/api/number-classifier/list_models/')
+        etag = response['ETag']
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(etag.startswith('W/'), 'The ETag should be strong')
+        self.assertIsInstance(response.json()['result']['models'], list)
+        
+        response = client.get('http://127.0.0.1:8000/api/number-classifier/list_models/', HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        
+        response = client.get('http://127.0.0.1:8000/api/number-classifier/list_models/', HTTP_IF_NONE_MATCH='"other"')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        
     def test_predict_invalid_json_request(self):
 
         client = Client()
@@ -79,6 +113,30 @@ class NumberClassifierTestCase(TestCase):
         self.assertEqual(False, response.json().get('success', ''), "The value of the 'success' key should be False")
         self.assertIn("The 'values' elements must be integers", response.json().get('result', {}).get('error_msg'))
         
+    def test_predict_invalid_integer_values(self):
+        """
+        Tests that booleans, floats and integers that do not fit in 64 bits are rejected, reporting the index of the first invalid element.
+        Some JSON backends decode the integers that do not fit in 64 bits as floats, so only the index is checked for them.
+        
+        """
+        client = Client()
+        
+        for values, error_msg in [
+            ([1, 2, True], "The 'values' elements must be integers (index 2)"),
+            ([1, 2.0, 3], "The 'values' elements must be integers (index 1)"),
+            ([2 ** 64, 1], "(index 0)"),
+            ([1, -2 ** 63 - 1], "(index 1)"),
+        ]:
+            response = client.post(
+                'http://127.0.0.1:8000/api/number-classifier/predict/', 
+                data={'values': values}, 
+                content_type='application/json'
+            )
+            
+            self.assertEqual(False, response.json().get('success', ''), "The value of the 'success' key should be False")
+            self.assertIn("The 'values' elements must be", response.json().get('result', {}).get('error_msg'))
+            self.assertIn(error_msg, response.json().get('result', {}).get('error_msg'))
+        
     def test_predict_successful_classification_no_model_specified(self):
     
         client = Client()
@@ -161,4 +219,515 @@ class NumberClassifierTestCase(TestCase):
         self.assertEqual(False, response.json().get('success', ''), "The value of the 'success' key should be False")
         self.assertIn("Model name is not recognized", response.json().get('result', {}).get('error_msg'))
         
- 
+    def test_predict_async_successful_classification(self):
+        
+        client = Client()
+        
+        valid_data = {
+            'values': [0, 1, 2, 3, 4, 5]
+        }
+        result_data = {
+                'success': True,
+                'result': {
+                    'classification': [
+                        [0, "FizzBuzz"], 
+                        [1, "None"], 
+                        [2, "None"], 
+                        [3, "Fizz"], 
+                        [4, "None"], 
+                        [5, "Buzz"],
+                    ]
+                }
+            }
+        
+        response = client.post(
+            'http://127.0.0.1:8000/api/number-classifier/predict_async/', 
+            data=valid_data, 
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), result_data, 'Classification fails in the async endpoint')
+
+        
+    def test_predict_stream_classification(self):
+        """
+        Tests that the streaming endpoint accepts integers and JSON lists in newline-delimited lines, and returns the classification in batches (NDJSON).
+        
+        """
+        client = Client()
+        
+        response = client.post(
+            'http://127.0.0.1:8000/api/number-classifier/predict_stream/?model_name=decision_tree', 
+            data='0\n1\n\n[2, 3, 4]\n5\n', 
+            content_type='application/x-ndjson'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        classification = [pair for line in lines for pair in json.loads(line)]
+        
+        self.assertEqual(classification, [[0, "FizzBuzz"], [1, "None"], [2, "None"], [3, "Fizz"], [4, "None"], [5, "Buzz"]])
+        
+    def test_predict_stream_invalid_line(self):
+        
+        client = Client()
+        
+        response = client.post(
+            'http://127.0.0.1:8000/api/number-classifier/predict_stream/', 
+            data='1\n"a"\n', 
+            content_type='application/x-ndjson'
+        )
+        
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        error = json.loads(lines[-1])
+        
+        self.assertEqual(error['success'], False)
+        self.assertIn('Line 2', error['result']['error_msg'])
+        
+    def test_predict_stream_out_of_range_value(self):
+        """
+        Tests that a value that does not fit in 64 bits in the middle of a stream is reported with the 64-bit error, after the classification of the values read before it.
+        
+        """
+        client = Client()
+        
+        for value in (2 ** 63, 2 ** 70):
+            response = client.post(
+                'http://127.0.0.1:8000/api/number-classifier/predict_stream/?model_name=decision_tree', 
+                data=f'3\n[4, 5]\n[6, {value}]\n7\n', 
+                content_type='application/x-ndjson'
+            )
+            
+            lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+            classification = [pair for line in lines[:-1] for pair in json.loads(line)]
+            error = json.loads(lines[-1])
+            
+            self.assertEqual(classification, [[3, "Fizz"], [4, "None"], [5, "Buzz"]])
+            self.assertEqual(error['success'], False)
+            self.assertIn('Line 3: the values must be 64-bit integers (index 1)', error['result']['error_msg'])
+
+        
+    def test_predict_range_matches_values(self):
+        """
+        Tests that classifying a range gives the same response as classifying the list of its values.
+        
+        """
+        client = Client()
+        
+        for range_data in [{'start': 0, 'stop': 6}, {'start': 30, 'stop': -7, 'step': -4}]:
+            response = client.post(
+                'http://127.0.0.1:8000/api/number-classifier/predict/', 
+                data={'range': range_data, 'model_name': 'decision_tree'}, 
+                content_type='application/json'
+            )
+            expected = client.post(
+                'http://127.0.0.1:8000/api/number-classifier/predict/', 
+                data={'values': list(range(range_data['start'], range_data['stop'], range_data.get('step', 1))), 'model_name': 'decision_tree'}, 
+                content_type='application/json'
+            )
+            
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), expected.json())
+            
+    def test_predict_range_error_after_first_chunk(self):
+        """
+        Tests that a streamed range whose prediction fails after the first chunk ends with a valid JSON document with the error.
+        
+        """
+        from cls_server import views_cls
+        
+        def predict_batch(values, model_name=None):
+            if values[0] >= 4:
+                raise RuntimeError('prediction failed')
+            return np.array(['None'] * len(values))
+        
+        previous_predict_batch, views_cls._predict_batch = views_cls._predict_batch, predict_batch
+        try:
+            content = json.loads(b''.join(views_cls._stream_range((0, 10, 1), None, 4)))
+        finally:
+            views_cls._predict_batch = previous_predict_batch
+        
+        self.assertEqual(content['success'], False)
+        self.assertEqual(content['result']['error_msg'], 'prediction failed')
+        self.assertEqual([pair[0] for pair in content['result']['classification']], [0, 1, 2, 3])
+        
+    def test_predict_invalid_range(self):
+        
+        client = Client()
+        
+        for range_data, error_msg in [
+            ({'start': 10, 'stop': 0}, 'Start index cannot be greater than end index'),
+            ({'start': 0, 'stop': 10, 'step': 0}, 'Step cannot be zero'),
+            ({'start': 0}, "must have the 'start' and 'stop' keys"),
+            ({'start': 0, 'stop': 2 ** 70}, "must be 64-bit integers"),
+        ]:
+            response = client.post(
+                'http://127.0.0.1:8000/api/number-classifier/predict/', 
+                data={'range': range_data}, 
+                content_type='application/json'
+            )
+            
+            self.assertEqual(response.json().get('success'), False)
+            self.assertIn(error_msg, response.json().get('result', {}).get('error_msg'))
+
+        
+    def test_predict_compact_formats(self):
+        """
+        Tests the columnar (query parameter), run-length (Accept header, range request) and `.npy` formats of the predict endpoint.
+        
+        """
+        client = Client()
+        
+        response = client.post(
+            'http://127.0.0.1:8000/api/number-classifier/predict/?format=columnar', 
+            data={'values': [0, 1, 2, 3, 4, 5]}, 
+            content_type='application/json'
+        )
+        result = response.json()['result']
+        
+        self.assertEqual(result['values'], [0, 1, 2, 3, 4, 5])
+        self.assertEqual([result['labels'][code] for code in result['codes']], ["FizzBuzz", "None", "None", "Fizz", "None", "Buzz"])
+        
+        response = client.post(
+            'http://127.0.0.1:8000/api/number-classifier/predict/', 
+            data={'range': {'start': 0, 'stop': 6}}, 
+            content_type='application/json',
+            HTTP_ACCEPT='application/vnd.cls.rle+json'
+        )
+        result = response.json()['result']
+        
+        self.assertEqual(response['Content-Type'], 'application/vnd.cls.rle+json')
+        self.assertEqual(result['values'], {'start': 0, 'stop': 6, 'step': 1})
+        self.assertEqual(result['length'], 6)
+        self.assertEqual(
+            [result['labels'][code] for code, length in result['runs'] for _ in range(length)], 
+            ["FizzBuzz", "None", "None", "Fizz", "None", "Buzz"]
+        )
+        
+    def test_predict_rle_format_is_periodic(self):
+        """
+        Tests that the run-length format of a long range only encodes one cycle of the classification, so it is much smaller than the columnar format, and that it decodes to the same classification.
+        
+        """
+        client = Client()
+        
+        responses = {
+            response_format_name: client.post(
+                f'http://127.0.0.1:8000/api/number-classifier/predict/?format={response_format_name}', 
+                data={'range': {'start': 7, 'stop': 100007, 'step': 2}}, 
+                content_type='application/json'
+            )
+            for response_format_name in ('columnar', 'rle')
+        }
+        columnar = responses['columnar'].json()['result']
+        rle = responses['rle'].json()['result']
+        
+        cycle = [code for code, length in rle['runs'] for _ in range(length)]
+        
+        self.assertEqual(len(cycle), 15)
+        self.assertEqual([cycle[index % len(cycle)] for index in range(rle['length'])], columnar['codes'])
+        self.assertLess(len(responses['rle'].content) * 100, len(responses['columnar'].content))
+        
+        response = client.post(
+            'http://127.0.0.1:8000/api/number-classifier/predict/?format=npy', 
+            data={'values': [0, 1, 2, 3, 4, 5]}, 
+            content_type='application/json'
+        )
+        labels = json.loads(response['X-Labels'])
+        codes = np.load(io.BytesIO(response.content))
+        
+        self.assertEqual([labels[code] for code in codes], ["FizzBuzz", "None", "None", "Fizz", "None", "Buzz"])
+        
+    def test_predict_unsupported_format(self):
+        
+        client = Client()
+        
+        response = client.post(
+            'http://127.0.0.1:8000/api/number-classifier/predict/?format=xml', 
+            data={'values': [0, 1]}, 
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.json().get('success'), False)
+        self.assertIn('Unsupported format', response.json().get('result', {}).get('error_msg'))
+
+    def test_metrics(self):
+        """
+        Tests that the `/metrics` endpoint exports, in the Prometheus text format, the timing of the stages of the predict requests and of the models.
+        
+        """
+        client = Client()
+        
+        client.post('http://127.0.0.1:8000/api/number-classifier/predict/', data={'values': [0, 1, 2]}, content_type='application/json')
+        response = client.get('http://127.0.0.1:8000/metrics')
+        content = response.content.decode('utf-8')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE cls_model_predict_seconds histogram', content)
+        self.assertIn('cls_model_predict_seconds_bucket{model="svc",le="+Inf"}', content)
+        for stage in ('parse', 'validate', 'predict', 'serialize'):
+            self.assertIn(f'cls_request_stage_seconds_count{{endpoint="predict",stage="{stage}"}}', content)
+        self.assertIn('cls_request_values_bucket{endpoint="predict",le="10"}', content)
+        
+    def test_predict_stage_of_every_response_path(self):
+        """
+        Tests that the prediction of the compact formats and of the streamed ranges is recorded in the 'predict' stage.
+        
+        """
+        from cls_server import views_cls
+        
+        client = Client()
+        url = 'http://127.0.0.1:8000/api/number-classifier/predict/'
+        
+        def predict_count():
+            return next(
+                (value for name, labels, value in views_cls.REQUEST_STAGE_SECONDS.samples() 
+                 if name.endswith('_count') and labels == {'endpoint': 'predict', 'stage': 'predict'}), 
+                0
+            )
+        
+        for query, data in [
+            ('?format=columnar', {'values': [0, 1, 2]}),
+            ('?format=rle', {'range': {'start': 0, 'stop': 30}}),
+            ('?format=npy', {'values': [0, 1, 2]}),
+            ('', {'range': {'start': 0, 'stop': 30}}),
+        ]:
+            count = predict_count()
+            response = client.post(url + query, data=data, content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            
+            self.assertEqual(predict_count(), count + 1, query or 'range')
+
+
+class PredictionBatcherTestCase(TestCase):
+    
+    def test_concurrent_requests_are_coalesced(self):
+        """
+        Tests that concurrent requests for the same model are predicted in a single batch, and that each request receives its own slice of the result.
+        
+        """
+        calls = []
+        
+        def predict_batch(values, model_name):
+            calls.append((list(values), model_name))
+            return np.array([f'{model_name}:{value}' for value in values])
+        
+        batcher = PredictionBatcher(predict_batch, window=0.05, max_values=1000)
+        
+        async def run():
+            return await asyncio.gather(
+                batcher.predict([1, 2], 'knn'),
+                batcher.predict([3], 'knn'),
+                batcher.predict([4, 5, 6], None),
+            )
+        
+        results = asyncio.run(run())
+        
+        self.assertEqual([result.tolist() for result in results], [['knn:1', 'knn:2'], ['knn:3'], ['None:4', 'None:5', 'None:6']])
+        self.assertEqual(sorted(calls, key=str), sorted([([1, 2, 3], 'knn'), ([4, 5, 6], None)], key=str))
+
+
+class JSONCodecTestCase(TestCase):
+    
+    def test_backends_round_trip(self):
+        """
+        Tests that every installed backend decodes bytes and encodes to bytes with the same result.
+        
+        """
+        document = {'values': [0, -1, 2 ** 62], 'model_name': 'knn', 'result': [(1, 'Fizz'), (2, None)], 'success': True}
+        
+        for backend in BACKENDS:
+            try:
+                codec = JSONCodec(backend)
+            except ValueError:
+                continue
+            
+            encoded = codec.dumps(document)
+            
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(json.loads(encoded), json.loads(json.dumps(document)))
+            self.assertEqual(codec.loads(b'{"values": [1, 2, 3]}'), {'values': [1, 2, 3]})
+            with self.assertRaises(ValueError):
+                codec.loads(b'{"values": [1, 2')
+            
+    def test_backend_selection(self):
+        
+        self.assertIn(JSONCodec('auto').backend, BACKENDS)
+        self.assertEqual(JSONCodec('json').backend, 'json')
+        
+        with self.assertRaises(ValueError):
+            JSONCodec('simplejson')
+
+
+class ModelReloadTestCase(TestCase):
+    
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.reloads = []
+        self.watcher = ModelWatcher(self.dir.name, lambda: self.reloads.append(True), interval=0)
+        
+    def tearDown(self):
+        self.dir.cleanup()
+        
+    def publish(self, content):
+        with open(os.path.join(self.dir.name, 'manifest.json.tmp'), 'w') as f:
+            f.write(content)
+        os.replace(os.path.join(self.dir.name, 'manifest.json.tmp'), os.path.join(self.dir.name, 'manifest.json'))
+        
+    def test_watcher_reloads_when_manifest_changes(self):
+        """
+        Tests that the models are reloaded once per new manifest, and that a failed reload is tried again.
+        
+        """
+        self.assertFalse(self.watcher.check())
+        
+        self.publish('{"models": []}')
+        self.assertTrue(self.watcher.check())
+        self.assertFalse(self.watcher.check())
+        self.assertTrue(self.watcher.check(force=True))
+        self.assertEqual(len(self.reloads), 2)
+        
+        self.watcher.reload = lambda: 1 / 0
+        self.publish('{"models": ["knn"]}')
+        with self.assertRaises(ZeroDivisionError):
+            self.watcher.check()
+            
+        self.watcher.reload = lambda: self.reloads.append(True)
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(len(self.reloads), 3)
+        
+    def test_reload_endpoint(self):
+        """
+        Tests that the reload endpoint is disabled without admin token, requires the token, and reloads the models.
+        
+        """
+        from cls_server import views_cls
+        
+        client = Client()
+        url = 'http://127.0.0.1:8000/api/number-classifier/reload_models/'
+        self.publish('{"models": []}')
+        
+        previous_watcher, views_cls.watcher = views_cls.watcher, self.watcher
+        try:
+            with override_settings(CLS_ADMIN_TOKEN=None):
+                self.assertEqual(client.post(url).status_code, 404)
+            
+            with override_settings(CLS_ADMIN_TOKEN='secret'):
+                self.assertEqual(client.post(url, HTTP_AUTHORIZATION='Bearer other').status_code, 401)
+                
+                response = client.post(url, HTTP_AUTHORIZATION='Bearer secret')
+        finally:
+            views_cls.watcher = previous_watcher
+        
+        self.assertEqual(response.json(), {'success': True, 'result': {'models': views_cls.classifier.models_name()}})
+        self.assertEqual(len(self.reloads), 1)
+
+
+class TrainingJobsTestCase(TestCase):
+    
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.reloads = []
+        self.jobs = TrainingJobs(self.dir.name, on_success=lambda: self.reloads.append(True))
+        
+    def tearDown(self):
+        self.dir.cleanup()
+        
+    def test_job_publishes_models(self):
+        """
+        Tests that a training job runs in another process, reports its progress and publishes the best of the requested models.
+        
+        """
+        job = self.jobs.submit((1000, 1100, 1), (1, 50, 1), ['decision_tree', 'naive_bayes'])
+        self.assertEqual(job['status'], 'queued')
+        
+        job = self.jobs.wait(job['id'], timeout=120)
+        self.assertEqual(job['status'], 'succeeded', job['error'])
+        self.assertEqual((job['stage'], job['done'], job['total']), ('saving', 1, 1))
+        self.assertEqual(self.reloads, [True])
+        
+        with open(os.path.join(self.dir.name, 'manifest.json')) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['models'], job['models'])
+        self.assertTrue(set(job['models']) <= {'decision_tree', 'naive_bayes'})
+        self.assertEqual(manifest['metadata']['job'], job['id'])
+        
+        self.assertEqual([listed['id'] for listed in self.jobs.list()], [job['id']])
+        self.assertIsNone(job['reload_error'])
+        
+    def test_reload_error_does_not_fail_the_job(self):
+        """
+        Tests that a job whose models are published but cannot be loaded by the server succeeds, and reports the error of the reload.
+        
+        """
+        self.jobs.on_success = lambda: 1 / 0
+        
+        job = self.jobs.wait(self.jobs.submit((1000, 1100, 1), (1, 50, 1), ['naive_bayes'])['id'], timeout=120)
+        
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['models'], ['naive_bayes'])
+        self.assertIsNone(job['error'])
+        self.assertIn('division by zero', job['reload_error'])
+        self.assertTrue(os.path.exists(os.path.join(self.dir.name, 'manifest.json')))
+        
+    def test_invalid_jobs(self):
+        """
+        Tests that the jobs with invalid ranges or models are rejected, and that a job that fails reports its error.
+        
+        """
+        with self.assertRaises(ValueError):
+            self.jobs.submit((100, 1, 1), (1, 50, 1))
+        with self.assertRaises(ValueError):
+            self.jobs.submit((1, 100, 1), (1, 50, 1), ['perceptron'])
+        with self.assertRaises(ValueError):
+            self.jobs.submit((1, 100, 1), (1, 50, 1), [])
+        
+        # A range of one value cannot be split in folds
+        job = self.jobs.wait(self.jobs.submit((1, 1, 1), (1, 50, 1), ['naive_bayes'])['id'], timeout=120)
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(job['error'])
+        self.assertEqual(self.reloads, [])
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, 'manifest.json')))
+        
+    def test_train_endpoint(self):
+        """
+        Tests that the train endpoints are disabled without admin token, require the token, validate the request and report the status of the jobs.
+        
+        """
+        from cls_server import views_cls
+        
+        client = Client()
+        url = 'http://127.0.0.1:8000/api/number-classifier/train/'
+        headers = {'HTTP_AUTHORIZATION': 'Bearer secret'}
+        
+        previous_jobs, views_cls.training_jobs = views_cls.training_jobs, self.jobs
+        try:
+            with override_settings(CLS_ADMIN_TOKEN=None):
+                self.assertEqual(client.get(url).status_code, 404)
+            
+            with override_settings(CLS_ADMIN_TOKEN='secret'):
+                self.assertEqual(client.post(url, HTTP_AUTHORIZATION='Bearer other').status_code, 401)
+                self.assertEqual(client.put(url, **headers).status_code, 405)
+                self.assertEqual(client.post(url, '{', content_type='application/json', **headers).status_code, 400)
+                self.assertEqual(client.post(url, {'train_parameters': [1, 2]}, content_type='application/json', **headers).status_code, 400)
+                self.assertEqual(client.post(url, {'models': ['perceptron']}, content_type='application/json', **headers).status_code, 400)
+                
+                body = {'train_parameters': [1000, 1100, 1], 'test_parameters': [1, 50, 1], 'models': ['naive_bayes']}
+                response = client.post(url, body, content_type='application/json', **headers)
+                self.assertEqual(response.status_code, 202)
+                job_id = response.json()['result']['job']['id']
+                
+                self.jobs.wait(job_id, timeout=120)
+                response = client.get(f'{url}{job_id}/', **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['result']['job']['status'], 'succeeded')
+                self.assertEqual(response.json()['result']['job']['request'], body)
+                
+                self.assertEqual(client.get(f'{url}unknown/', **headers).status_code, 404)
+                self.assertEqual([job['id'] for job in client.get(url, **headers).json()['result']['jobs']], [job_id])
+        finally:
+            views_cls.training_jobs = previous_jobs